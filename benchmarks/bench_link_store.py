@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from link_store import LinkStore, read_links
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def filter_with_lists(links_to_index, indexed_links, failed_links):
+    # Так process_links фильтровал ссылки раньше: линейный поиск по спискам
+    return [url for url in links_to_index if url not in indexed_links and url not in failed_links]
+
+
+def filter_with_store(store, links_to_index):
+    return [url for url in links_to_index if not store.is_processed(url)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay data/*_med.txt through list and LinkStore filters")
+    parser.add_argument('--suffix', default='med')
+    parser.add_argument('--sample', type=int, default=2000,
+                        help="pending links to filter with the list baseline (0 = all, very slow)")
+    args = parser.parse_args()
+
+    indexed_file = f'indexed_links_{args.suffix}.txt'
+    failed_file = f'failed_links_{args.suffix}.txt'
+    pending_file = f'links_to_index_{args.suffix}.txt'
+
+    (indexed_links, failed_links, links_to_index), list_load = timed(lambda: (
+        read_links(os.path.join(DATA_DIR, indexed_file)),
+        read_links(os.path.join(DATA_DIR, failed_file)),
+        read_links(os.path.join(DATA_DIR, pending_file)),
+    ))
+    store, store_load = timed(lambda: LinkStore(indexed_file, failed_file, pending_file, data_dir=DATA_DIR).load())
+
+    sample = links_to_index[:args.sample] if args.sample else links_to_index
+    list_result, list_filter = timed(lambda: filter_with_lists(sample, indexed_links, failed_links))
+    store_result, store_filter = timed(lambda: filter_with_store(store, sample))
+    full_result, full_filter = timed(lambda: filter_with_store(store, list(store.pending)))
+    assert list_result == store_result
+
+    projected = list_filter * len(links_to_index) / max(len(sample), 1)
+    print(f"indexed={len(indexed_links)} failed={len(failed_links)} pending={len(links_to_index)}")
+    print(f"load:   lists {list_load:.3f}s, store {store_load:.3f}s")
+    print(f"filter ({len(sample)} urls): lists {list_filter:.3f}s, store {store_filter:.4f}s "
+          f"({list_filter / max(store_filter, 1e-9):.0f}x)")
+    print(f"filter (all {len(links_to_index)} urls): lists ~{projected:.1f}s projected, store {full_filter:.4f}s, "
+          f"{len(full_result)} left to publish")
+
+
+if __name__ == "__main__":
+    main()
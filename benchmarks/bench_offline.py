@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from fake_services import TOKEN_PATH, FakeServices, Faults, make_service_account
+from sitemap_generator import generate, load_seed_urls, synthetic_urls
+
+# Сценарии без обращения к Google и Telegram: загрузка состояния, обход sitemap,
+# отправка ссылок и полный запуск indexer.main() против локального стенда.
+# Каждый сценарий выполняется rounds раз, как в pytest-benchmark: min / mean / max.
+
+SCENARIOS = ('state_load', 'sitemap_crawl', 'publish', 'end_to_end')
+
+
+def bench(name, func, rounds, setup=None, items=None):
+    timings = []
+    result = None
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    stats = {
+        'name': name,
+        'rounds': rounds,
+        'min': min(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+    }
+    line = f"{name:<40} min {stats['min']:8.3f}s  mean {stats['mean']:8.3f}s  max {stats['max']:8.3f}s"
+    if items:
+        stats['items_per_second'] = items / stats['min']
+        line += f"  {stats['items_per_second']:10.0f} items/s"
+    print(line)
+    return stats, result
+
+
+def write_links(path, urls):
+    with open(path, 'w') as f:
+        f.writelines(f"{url}\n" for url in urls)
+
+
+def scenario_state_load(args, work_dir, services):
+    from link_store import LinkStore
+    from scheduler import make_priority
+    from urls import make_canonicalizer
+
+    # Проиндексированных в 2 раза больше, чем ожидающих, и половина очереди уже обработана -
+    # как в data/*_med.txt
+    data_dir = os.path.join(work_dir, 'state')
+    os.makedirs(data_dir, exist_ok=True)
+    urls = list(synthetic_urls(args.urls + args.urls // 2))
+    write_links(os.path.join(data_dir, 'indexed.txt'), urls[:args.urls])
+    write_links(os.path.join(data_dir, 'pending.txt'), urls[args.urls // 2:])
+    write_links(os.path.join(data_dir, 'failed.txt'), [])
+    canonicalize = make_canonicalizer({'force_params': {'sl': 'ru'}, 'trailing_slash': 'add'})
+
+    def load(priority, rules):
+        return LinkStore('indexed.txt', 'failed.txt', 'pending.txt', data_dir=data_dir,
+                         priority=make_priority() if priority else None,
+                         canonicalize=canonicalize if rules else None).load()
+
+    results = [
+        bench('state_load[fifo]', lambda: load(False, False), args.rounds, items=len(urls))[0],
+        bench('state_load[priority]', lambda: load(True, False), args.rounds, items=len(urls))[0],
+        bench('state_load[priority+canonical]', lambda: load(True, True), args.rounds, items=len(urls))[0],
+    ]
+    return results
+
+
+def scenario_sitemap_crawl(args, work_dir, services):
+    from sitemap import SitemapState, iter_sitemap_entries
+    from transport import create_session
+
+    sitemap_dir = os.path.join(work_dir, 'sitemaps')
+    root = generate(sitemap_dir, args.urls, services.sitemap_url(''), args.per_sitemap)
+    services.sitemap_dir = sitemap_dir
+    session = create_session()
+
+    def crawl(workers):
+        state = SitemapState('cache.json', 'lastmod.tsv', work_dir)
+        return sum(1 for _ in iter_sitemap_entries(services.sitemap_url(root), session, workers, state))
+
+    results = []
+    for workers in (1, 8):
+        stats, count = bench(f'sitemap_crawl[workers={workers}]', lambda: crawl(workers), args.rounds, items=args.urls)
+        assert count == args.urls, f"crawled {count} of {args.urls} links"
+        results.append(stats)
+    return results
+
+
+def scenario_publish(args, work_dir, services):
+    from google_client import get_service
+    from publisher import publish_links
+    from rate_limiter import TokenBucket
+
+    service = get_service(make_service_account(services.url + TOKEN_PATH), 'bench')
+    urls = list(synthetic_urls(args.publish_urls))
+    results = []
+    for batch_size, workers in ((1, 4), (100, 1), (100, 4)):
+        name = f'publish[batch={batch_size},workers={workers}]'
+        stats, _ = bench(name, lambda: publish_links(service, urls, len(urls), lambda url, response: False,
+                                                     TokenBucket(1e6, 1000), batch_size, workers),
+                         args.rounds, setup=services.reset, items=len(urls))
+        stats['server'] = dict(services.stats)
+        results.append(stats)
+    return results
+
+
+def scenario_end_to_end(args, work_dir, services):
+    # Полный запуск индексатора: токен, проверка квоты, sitemap, отправка, журнал и уведомление
+    import indexer
+
+    run_dir = os.path.join(work_dir, 'run')
+    sitemap_dir = os.path.join(run_dir, 'sitemaps')
+    os.makedirs(os.path.join(run_dir, 'data'), exist_ok=True)
+    root = generate(sitemap_dir, args.publish_urls, services.sitemap_url(''), args.per_sitemap)
+    services.sitemap_dir = sitemap_dir
+    os.environ['BENCH_CREDENTIALS'] = make_service_account(services.url + TOKEN_PATH)
+    config = {
+        'defaults': {'daily_quota': args.publish_urls, 'rate': 1e6, 'burst': 1000},
+        'sites': [{'name': 'bench.local', 'sitemap_url': services.sitemap_url(root),
+                   'credentials_env': 'BENCH_CREDENTIALS', 'data_suffix': 'bench'}],
+    }
+    with open(os.path.join(run_dir, 'sites.json'), 'w') as f:
+        json.dump(config, f)
+
+    def run():
+        for name in os.listdir(os.path.join(run_dir, 'data')):
+            os.remove(os.path.join(run_dir, 'data', name))
+        sys.argv = ['indexer', '--config', 'sites.json']
+        indexer.main()
+        with open(os.path.join('data', 'run_report.json')) as f:
+            return json.load(f)
+
+    cwd = os.getcwd()
+    os.chdir(run_dir)
+    try:
+        stats, report = bench('end_to_end', run, args.rounds, setup=services.reset, items=args.publish_urls)
+    finally:
+        os.chdir(cwd)
+    stats['phases'] = report['sites']['bench.local']['phases']
+    stats['server'] = dict(services.stats)
+    return [stats]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local fake Indexing API")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="run only this scenario")
+    parser.add_argument('--urls', type=int, default=100000, help="links for state and sitemap scenarios")
+    parser.add_argument('--publish-urls', type=int, default=2000, help="links for publish scenarios")
+    parser.add_argument('--per-sitemap', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help="fake API latency per request, seconds")
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-503', type=float, default=0.0)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON")
+    args = parser.parse_args()
+
+    print(f"Seed: {len(load_seed_urls())} links from data/links_to_index_med.txt")
+    faults = Faults(args.rate_429, args.rate_503, args.latency)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir, FakeServices(faults) as services:
+        # Стенд должен быть известен до импорта клиента Google и уведомлений
+        os.environ.update(services.environ())
+        for scenario in args.scenario or SCENARIOS:
+            results.extend(globals()[f'scenario_{scenario}'](args, work_dir, services))
+        # Уведомления досылаются, пока стенд ещё работает
+        from notifier import get_notifier
+        get_notifier().close()
+        print(f"Telegram stub received {len(services.messages)} messages")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Локальный стенд вместо внешних сервисов: Indexing API (publish, getMetadata, batch),
+# выдача OAuth-токенов для сервисного аккаунта, Telegram Bot API и раздача файлов sitemap.
+# Индексатор направляется сюда через INDEXING_API_ENDPOINT, TELEGRAM_API_URL и token_uri
+# в учётных данных - см. FakeServices.environ() и make_service_account().
+
+PUBLISH_PATH = '/v3/urlNotifications:publish'
+METADATA_PATH = '/v3/urlNotifications/metadata'
+BATCH_PATH = '/batch'
+TOKEN_PATH = '/token'
+SITEMAP_PREFIX = '/sitemaps/'
+
+
+class Faults:
+    # Настройки сбоев: доля ответов 429 и 503, задержка каждого HTTP-запроса,
+    # общий лимит publish-запросов, после которого все ответы - 429 (дневная квота),
+    # и сколько первых сообщений Telegram получат 429 с retry_after
+    def __init__(self, rate_429=0.0, rate_503=0.0, latency=0.0, quota=None, seed=0, telegram_429=0,
+                 telegram_retry_after=1):
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.latency = latency
+        self.quota = quota
+        self.telegram_429 = telegram_429
+        self.telegram_retry_after = telegram_retry_after
+        self.random = random.Random(seed)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят одним пакетом, иначе Nagle и delayed ACK добавляют ~40 мс на запрос
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Сколько TCP-соединений открыл клиент: с keep-alive их единицы на весь запуск
+        self.server.services.count('connections')
+
+    @property
+    def services(self):
+        return self.server.services
+
+    def send(self, code, body, content_type='application/json'):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_GET(self):
+        path = urlsplit(self.path)
+        self.services.delay()
+        if path.path.startswith(SITEMAP_PREFIX):
+            return self.send_sitemap(path.path[len(SITEMAP_PREFIX):])
+        if path.path == METADATA_PATH:
+            url = parse_qs(path.query).get('url', [''])[0]
+            self.services.count('metadata')
+            return self.send(200, json.dumps({'url': url}))
+        self.send(404, json.dumps({'error': {'code': 404, 'message': 'Not found'}}))
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self.read_body()
+        self.services.delay()
+        if path == TOKEN_PATH:
+            self.services.count('token')
+            return self.send(200, json.dumps({'access_token': 'fake-token', 'expires_in': 3600,
+                                              'token_type': 'Bearer'}))
+        if path == PUBLISH_PATH:
+            return self.send(*self.services.publish(body.decode('utf-8')))
+        if path == BATCH_PATH:
+            return self.send_batch(body.decode('utf-8'))
+        match = re.fullmatch(r'/bot[^/]+/sendMessage', path)
+        if match:
+            return self.send(*self.services.send_message(parse_qs(body.decode('utf-8')).get('text', [''])[0]))
+        self.send(404, json.dumps({'error': {'code': 404, 'message': 'Not found'}}))
+
+    def send_sitemap(self, name):
+        full_path = os.path.join(self.services.sitemap_dir or '', name)
+        if not self.services.sitemap_dir or not os.path.isfile(full_path):
+            return self.send(404, 'Not found', 'text/plain')
+        self.services.count('sitemap')
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        self.services.count('sitemap_bytes', len(data))
+        self.send(200, data, 'application/x-gzip' if name.endswith('.gz') else 'application/xml')
+
+    def send_batch(self, body):
+        # multipart/mixed: каждая часть - отдельный HTTP-запрос publish со своим Content-ID
+        self.services.count('batch')
+        boundary = re.search(r'boundary="?([^";]+)', self.headers['Content-Type']).group(1)
+        parts = []
+        for part in body.split(f'--{boundary}'):
+            content_id = re.search(r'Content-ID: <([^>]+)>', part)
+            payload = re.search(r'\{.*\}', part, re.S)
+            if content_id and payload:
+                code, response = self.services.publish(payload.group(0))
+                parts.append(
+                    f"--batch_response\r\nContent-Type: application/http\r\n"
+                    f"Content-ID: <response-{content_id.group(1)}>\r\n\r\n"
+                    f"HTTP/1.1 {code} {self.responses.get(code, ('',))[0]}\r\n"
+                    f"Content-Type: application/json\r\n\r\n{response}\r\n"
+                )
+        self.send(200, ''.join(parts) + '--batch_response--', 'multipart/mixed; boundary=batch_response')
+
+
+class FakeServices:
+    def __init__(self, faults=None, sitemap_dir=None, host='127.0.0.1', port=0):
+        self.faults = faults or Faults()
+        self.sitemap_dir = sitemap_dir
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.published = []
+        self.messages = []
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.server.services = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-services', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def environ(self):
+        # Переменные окружения, которые направляют индексатор на стенд
+        return {
+            'INDEXING_API_ENDPOINT': self.url,
+            'TELEGRAM_API_URL': self.url,
+            'TELEGRAM_TOKEN': 'fake-telegram-token',
+            'TELEGRAM_CHAT_ID': '1',
+        }
+
+    def sitemap_url(self, name):
+        return f"{self.url}{SITEMAP_PREFIX}{name}"
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.published = []
+            self.messages = []
+
+    def delay(self):
+        if self.faults.latency:
+            time.sleep(self.faults.latency)
+
+    def send_message(self, text):
+        faults = self.faults
+        with self.lock:
+            rate_limited = self.stats.get('telegram_429', 0) < faults.telegram_429
+            if not rate_limited:
+                self.messages.append(text)
+        if rate_limited:
+            self.count('telegram_429')
+            return 429, json.dumps({'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                    'parameters': {'retry_after': faults.telegram_retry_after}})
+        self.count('telegram')
+        return 200, json.dumps({'ok': True, 'result': {}})
+
+    def publish(self, body):
+        url = json.loads(body).get('url')
+        faults = self.faults
+        with self.lock:
+            self.stats['publish'] = self.stats.get('publish', 0) + 1
+            over_quota = faults.quota is not None and len(self.published) >= faults.quota
+            roll = faults.random.random()
+            if not over_quota and roll >= faults.rate_429 + faults.rate_503:
+                self.published.append(url)
+        if over_quota or roll < faults.rate_429:
+            self.count('429')
+            return 429, json.dumps({'error': {'code': 429, 'message': 'Quota exceeded', 'status': 'RESOURCE_EXHAUSTED'}})
+        if roll < faults.rate_429 + faults.rate_503:
+            self.count('503')
+            return 503, json.dumps({'error': {'code': 503, 'message': 'Service unavailable', 'status': 'UNAVAILABLE'}})
+        self.count('200')
+        return 200, json.dumps({'urlNotificationMetadata': {'url': url, 'latestUpdate': {'url': url,
+                                                                                        'type': 'URL_UPDATED'}}})
+
+
+def make_service_account(token_uri, email='bench@fake-project.iam.gserviceaccount.com'):
+    # Учётные данные сервисного аккаунта со случайным ключом: подпись JWT проходит как обычно,
+    # а токен выдаёт стенд по token_uri
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode('ascii')
+    return json.dumps({
+        'type': 'service_account',
+        'project_id': 'fake-project',
+        'private_key_id': 'fake-key',
+        'private_key': private_key,
+        'client_email': email,
+        'client_id': '1',
+        'token_uri': token_uri,
+    })
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the fake Indexing API, Telegram and sitemap server")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--sitemap-dir', help="serve files from this directory under /sitemaps/")
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-503', type=float, default=0.0)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--quota', type=int, help="successful publishes before every answer is 429")
+    args = parser.parse_args()
+
+    services = FakeServices(Faults(args.rate_429, args.rate_503, args.latency, args.quota), args.sitemap_dir,
+                            port=args.port)
+    print(f"Serving on {services.url}")
+    for name, value in services.environ().items():
+        print(f"export {name}={value}")
+    print(f"Service account token_uri: {services.url}{TOKEN_PATH}")
+    try:
+        services.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        services.server.server_close()
+        print(json.dumps(services.stats, indent=1, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
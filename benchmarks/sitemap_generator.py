@@ -0,0 +1,112 @@
+import argparse
+import gzip
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+SEED_FILE = 'links_to_index_med.txt'
+URLS_PER_SITEMAP = 50000
+SITEMAPS_PER_INDEX = 50
+NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def load_seed_urls(seed_file=SEED_FILE, data_dir=DATA_DIR):
+    full_path = os.path.join(data_dir, seed_file)
+    if os.path.exists(full_path):
+        with open(full_path, 'r') as f:
+            urls = [line.strip() for line in f if line.strip()]
+        if urls:
+            return urls
+    return ['https://med.vitrina24.kz/apteki/medikamenty/product/?sl=ru']
+
+
+def synthetic_urls(count, seed_urls=None):
+    # Ссылки той же формы, что в data/links_to_index_med.txt: тот же хост, глубина пути
+    # и параметры; после исчерпания образцов к последнему сегменту пути добавляется номер
+    seed_urls = seed_urls or load_seed_urls()
+    for i in range(count):
+        url = seed_urls[i % len(seed_urls)]
+        round_number = i // len(seed_urls)
+        if round_number:
+            base, sep, query = url.partition('?')
+            head, slash, tail = base.rstrip('/').rpartition('/')
+            url = f"{head}{slash}{tail}-copy{round_number}/{sep}{query}"
+        yield url
+
+
+def write_xml(path, lines, compress):
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        for line in lines:
+            f.write(line)
+
+
+def url_entries(urls, rng, now):
+    yield f'<urlset xmlns="{NS}">\n'
+    for url in urls:
+        lastmod = (now - timedelta(minutes=rng.randrange(60 * 24 * 365))).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        priority = rng.choice(('0.5', '0.6', '0.8', '1.0'))
+        yield f'<url><loc>{escape(url)}</loc><lastmod>{lastmod}</lastmod><priority>{priority}</priority></url>\n'
+    yield '</urlset>\n'
+
+
+def index_entries(locations):
+    yield f'<sitemapindex xmlns="{NS}">\n'
+    for location in locations:
+        yield f'<sitemap><loc>{escape(location)}</loc></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def generate(out_dir, total_urls, base_url, urls_per_sitemap=URLS_PER_SITEMAP,
+             sitemaps_per_index=SITEMAPS_PER_INDEX, compress=True, seed=0, seed_urls=None):
+    # Корневой индекс ссылается на вложенные индексы, а те - на sitemap с ссылками.
+    # base_url - адрес, по которому будут раздаваться файлы из out_dir.
+    # Возвращает имя корневого файла
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    suffix = '.xml.gz' if compress else '.xml'
+    base_url = base_url.rstrip('/')
+
+    urls = synthetic_urls(total_urls, seed_urls)
+    sitemap_names = []
+    remaining = total_urls
+    while remaining > 0:
+        size = min(urls_per_sitemap, remaining)
+        name = f"sitemap-{len(sitemap_names) + 1}{suffix}"
+        write_xml(os.path.join(out_dir, name), url_entries((next(urls) for _ in range(size)), rng, now), compress)
+        sitemap_names.append(name)
+        remaining -= size
+
+    index_names = []
+    for start in range(0, len(sitemap_names), sitemaps_per_index):
+        name = f"sitemap-index-{len(index_names) + 1}.xml"
+        locations = [f"{base_url}/{child}" for child in sitemap_names[start:start + sitemaps_per_index]]
+        write_xml(os.path.join(out_dir, name), index_entries(locations), False)
+        index_names.append(name)
+
+    root_name = 'sitemap.xml'
+    write_xml(os.path.join(out_dir, root_name), index_entries(f"{base_url}/{name}" for name in index_names), False)
+    print(f"Generated {total_urls} links in {len(sitemap_names)} sitemaps and {len(index_names)} indexes "
+          f"under {out_dir}")
+    return root_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a nested sitemap index shaped like the real med data")
+    parser.add_argument('out_dir')
+    parser.add_argument('--urls', type=int, default=100000)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8765/sitemaps',
+                        help="URL the generated files will be served from")
+    parser.add_argument('--per-sitemap', type=int, default=URLS_PER_SITEMAP)
+    parser.add_argument('--per-index', type=int, default=SITEMAPS_PER_INDEX)
+    parser.add_argument('--no-gzip', action='store_true')
+    args = parser.parse_args()
+    generate(args.out_dir, args.urls, args.base_url, args.per_sitemap, args.per_index, not args.no_gzip)
+
+
+if __name__ == "__main__":
+    main()
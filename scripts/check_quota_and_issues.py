@@ -1,26 +1,13 @@
-import requests
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from google_client import get_account, get_service
+from indexer import DEFAULT_CONFIG, load_sites
+from notifier import get_notifier
+from quota_ledger import QuotaLedger
 
-SCOPES = ['https://www.googleapis.com/auth/indexing']
-VITRINA24KZ_CREDENTIALS = os.getenv('VITRINA24KZ_CREDENTIALS')
-MEDVITRINA24KZ_CREDENTIALS = os.getenv('MEDVITRINA24KZ_CREDENTIALS')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 
-def get_service(credentials_json):
-    with open('temp_credentials.json', 'w') as f:
-        f.write(credentials_json)
-    credentials = service_account.Credentials.from_service_account_file(
-        'temp_credentials.json', scopes=SCOPES)
-    service = build('indexing', 'v3', credentials=credentials)
-    os.remove('temp_credentials.json')
-    return service
-
-def check_quota(service):
+def check_quota(service, site):
     try:
-        response = service.urlNotifications().getMetadata(url='https://vitrina24.kz').execute()
+        response = service.urlNotifications().getMetadata(url=f'https://{site}').execute()
         print(f"Quota check response: {response}")
         return False
     except Exception as e:
@@ -28,28 +15,48 @@ def check_quota(service):
         return True
 
 def send_telegram_message(message):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    data = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message
-    }
-    response = requests.post(url, data=data)
-    return response
+    get_notifier().notify(message)
 
 def main():
     print("Checking quota")
-    vitrina_service = get_service(VITRINA24KZ_CREDENTIALS)
-    med_service = get_service(MEDVITRINA24KZ_CREDENTIALS)
-
-    quota_exceeded = check_quota(vitrina_service) or check_quota(med_service)
+    # Остаток квоты берётся из журнала квоты; запрос к API - только для аккаунтов без данных
+    ledger = QuotaLedger().load()
+    quota_exceeded = False
+    issues = []
+    for site in load_sites(DEFAULT_CONFIG):
+        # Квота сайта исчерпана, только если её не осталось ни у одного аккаунта пула.
+        # Аккаунты без учётных данных пропускаются, как в indexer.read_accounts
+        site_exceeded = True
+        usable = 0
+        skipped = []
+        for credentials_env in site['credentials_envs']:
+            credentials_json = os.getenv(credentials_env)
+            try:
+                account = get_account(credentials_json, site['name'])
+            except ValueError as e:
+                print(f"Skipping {credentials_env} for {site['name']}: {e}")
+                skipped.append(f"{site['name']} ({credentials_env}): {e}")
+                continue
+            usable += 1
+            if ledger.has_data(account):
+                remaining = ledger.remaining(account, site['daily_quota'])
+                print(f"{site['name']}: {remaining} of {site['daily_quota']} publishes left today for {account}")
+                site_exceeded = site_exceeded and remaining == 0
+            else:
+                service = get_service(credentials_json, site['name'])
+                site_exceeded = site_exceeded and check_quota(service, site['name'])
+        if not usable:
+            # Пул без единого рабочего аккаунта - проблема сайта, а не исчерпанная квота
+            issues.append(f"No usable credentials for {site['name']} ({', '.join(site['credentials_envs'])})")
+            continue
+        issues.extend(skipped)
+        quota_exceeded = quota_exceeded or site_exceeded
     if quota_exceeded:
         send_telegram_message("Quota exceeded or issue detected.")
     else:
         print("Quota is within limits.")
 
     # Добавьте любую дополнительную логику для проверки проблем
-    issues = []
-
     if issues:
         for issue in issues:
             send_telegram_message(f"Issue detected: {issue}")
@@ -0,0 +1,297 @@
+import json
+import os
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from indexer import (count_pending_links, load_liveness, load_site_state, open_services, publish_site_links,
+                     read_accounts, refresh_site_links, remaining_budget, reserve_budgets, save_site_state,
+                     send_telegram_message)
+from link_store import DATA_DIR
+from metrics import REPORT_FILE, RunMetrics
+from quota_ledger import QuotaLedger, utc_today
+from transport import create_session
+
+# Режим службы вместо запусков по cron: состояние сайтов и клиенты API держатся в памяти,
+# sitemap проверяется раз в sitemap_interval, ссылки отправляются, пока есть квота,
+# а после полуночи UTC журнал квоты сам начинает новые сутки
+TICK_INTERVAL = 60
+CHECKPOINT_INTERVAL = 300
+STATUS_HOST = '127.0.0.1'
+STATUS_PORT = 8787
+# Аккаунт, для которого не удалось создать клиент или пройти проверку квоты, пробуем снова через час
+ACCOUNT_RETRY_DELAY = 3600
+# Сайт считается зависшим, если цикл не завершался дольше стольких интервалов
+STALE_TICKS = 3
+
+
+def isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+class SiteWorker:
+    # Один сайт в своём потоке: состояние загружается один раз, дальше циклы раз в tick_interval
+    def __init__(self, site, ledger, session, metrics, stop_event, tick_interval=TICK_INTERVAL,
+                 checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.site = site
+        self.name = site['name']
+        self.ledger = ledger
+        self.session = session
+        self.metrics = metrics
+        self.stop_event = stop_event
+        self.tick_interval = tick_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.thread = threading.Thread(target=self.run, name=f"site-{self.name}", daemon=True)
+
+        self.accounts = []
+        self.services = {}
+        self.account_retry = {}
+        self.store = None
+        self.next_sitemap_check = 0
+        self.last_checkpoint = time.time()
+        self.day = utc_today()
+        self.published_today = 0
+
+        self.state = 'starting'
+        self.busy_since = None
+        self.last_tick = None
+        self.last_sitemap_check = None
+        self.last_error = None
+        self.published_total = 0
+
+    def start(self):
+        self.thread.start()
+
+    def load(self):
+        self.accounts = read_accounts(self.site)
+        if not self.accounts:
+            raise ValueError(f"No usable credentials for {self.name}")
+        with self.metrics.phase('load'):
+            self.sitemap_state, self.retry_state, self.store, self.canonicalize = load_site_state(self.site)
+            self.liveness = load_liveness(self.site, self.canonicalize, self.session)
+
+    def run(self):
+        try:
+            self.load()
+        except Exception as e:
+            print(f"Cannot start indexing daemon for {self.name}: {e}")
+            send_telegram_message(f"Cannot start indexing daemon for {self.name}: {e}")
+            self.state = 'failed'
+            self.last_error = str(e)
+            return
+        while not self.stop_event.is_set():
+            self.busy_since = time.time()
+            try:
+                self.tick()
+                self.last_error = None
+            except Exception as e:
+                traceback.print_exc()
+                # Одна и та же ошибка на каждом цикле уходит в Telegram один раз
+                if str(e) != self.last_error:
+                    send_telegram_message(f"Indexing daemon error for {self.name}: {e}")
+                self.last_error = str(e)
+                self.state = 'error'
+            finally:
+                self.busy_since = None
+                self.last_tick = time.time()
+            if time.time() - self.last_checkpoint >= self.checkpoint_interval:
+                self.checkpoint()
+            self.stop_event.wait(self.tick_interval)
+        self.checkpoint()
+        self.state = 'stopped'
+
+    def tick(self):
+        self.roll_day()
+        if time.time() >= self.next_sitemap_check:
+            with self.metrics.phase('sitemap'):
+                new_links, updated_links = refresh_site_links(self.site, self.sitemap_state, self.store,
+                                                              self.canonicalize, self.session, self.metrics)
+            self.metrics.count('sitemap_new_links', new_links)
+            self.metrics.count('sitemap_updated_links', updated_links)
+            self.last_sitemap_check = time.time()
+            self.next_sitemap_check = self.last_sitemap_check + self.site['sitemap_interval']
+        self.metrics.set('pending_links', len(self.store.pending))
+        self.metrics.set('indexed_links', len(self.store.indexed))
+
+        if not count_pending_links(self.store, self.retry_state, 1):
+            self.state = 'idle'
+            return
+        available = remaining_budget(self.site, self.accounts, self.ledger)
+        if not available:
+            self.state = 'quota_exhausted'
+            return
+
+        # Резервируется не больше, чем ссылок можно отправить сейчас: остаток общего аккаунта нужен другим сайтам
+        wanted = count_pending_links(self.store, self.retry_state, available)
+        budgets = reserve_budgets(self.site, self.accounts, self.ledger, wanted)
+        try:
+            services = self.open_services(budgets)
+            if not services:
+                self.state = 'quota_exhausted'
+                return
+            self.state = 'publishing'
+            with self.metrics.phase('publish'):
+                count = publish_site_links(self.site, services, self.store, self.sitemap_state, self.retry_state,
+                                           self.ledger, self.liveness, self.metrics)
+            self.published_today += count
+            self.published_total += count
+        finally:
+            for account, _, granted in budgets:
+                self.ledger.release(account, granted)
+            self.ledger.save()
+
+    def open_services(self, budgets):
+        # Клиенты API создаются один раз на аккаунт и дальше переиспользуются
+        now = time.time()
+        missing = [budget for budget in budgets
+                   if budget[0] not in self.services and self.account_retry.get(budget[0], 0) <= now]
+        for account, service, _ in open_services(self.site, missing, self.ledger, self.metrics):
+            self.services[account] = service
+        for account, _, _ in missing:
+            if account not in self.services:
+                self.account_retry[account] = now + ACCOUNT_RETRY_DELAY
+        return [(account, self.services[account], granted) for account, _, granted in budgets
+                if account in self.services]
+
+    def roll_day(self):
+        # Новые сутки UTC: итог за прошедший день в Telegram, квота в журнале уже новая
+        today = utc_today()
+        if today != self.day:
+            send_telegram_message(f"{self.name} - отправлено {self.published_today} ссылок за {self.day}.")
+            self.day = today
+            self.published_today = 0
+
+    def checkpoint(self):
+        if self.store is None:
+            return
+        with self.metrics.phase('save'):
+            save_site_state(self.store, self.retry_state, self.sitemap_state, self.liveness)
+            self.ledger.save()
+        self.metrics.set('state_bytes_read', self.store.bytes_read)
+        self.metrics.set('state_bytes_written', self.store.bytes_written)
+        self.last_checkpoint = time.time()
+
+    def healthy(self):
+        if not self.thread.is_alive():
+            return False
+        if self.busy_since is not None or self.last_tick is None:
+            return True
+        return time.time() - self.last_tick < STALE_TICKS * self.tick_interval + self.tick_interval
+
+    def status(self):
+        store = self.store
+        return {
+            'state': self.state,
+            'healthy': self.healthy(),
+            'pending': len(store.pending) if store else None,
+            'indexed': len(store.indexed) if store else None,
+            'failed': len(store.failed) if store else None,
+            'published_today': self.published_today,
+            'published_total': self.published_total,
+            'last_tick': isoformat(self.last_tick),
+            'last_sitemap_check': isoformat(self.last_sitemap_check),
+            'next_sitemap_check': isoformat(self.next_sitemap_check or None),
+            'last_checkpoint': isoformat(self.last_checkpoint),
+            'last_error': self.last_error,
+            'accounts': {
+                account: {**self.ledger.usage(account),
+                          'remaining': self.ledger.remaining(account, self.site['daily_quota'])}
+                for account, _ in self.accounts
+            },
+        }
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    # /health - 200 или 503 для проверки живости, /status - состояние сайтов в JSON,
+    # /metrics - метрики за время работы в формате Prometheus
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, code, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        daemon = self.server.indexer_daemon
+        path = urlsplit(self.path).path
+        if path == '/health':
+            healthy = daemon.healthy()
+            return self.send(200 if healthy else 503, 'ok\n' if healthy else 'unhealthy\n', 'text/plain')
+        if path == '/status':
+            return self.send(200, json.dumps(daemon.status(), indent=1), 'application/json')
+        if path == '/metrics':
+            return self.send(200, "\n".join(daemon.metrics.prometheus_lines()) + "\n", 'text/plain; version=0.0.4')
+        self.send(404, 'Not found\n', 'text/plain')
+
+
+class IndexerDaemon:
+    def __init__(self, sites, host=STATUS_HOST, port=STATUS_PORT, tick_interval=TICK_INTERVAL,
+                 checkpoint_interval=CHECKPOINT_INTERVAL, prometheus_path=None):
+        self.started = time.time()
+        self.checkpoint_interval = checkpoint_interval
+        self.prometheus_path = prometheus_path
+        self.stop_event = threading.Event()
+        self.session = create_session()
+        self.ledger = QuotaLedger().load()
+        self.metrics = RunMetrics()
+        self.workers = [SiteWorker(site, self.ledger, self.session, self.metrics.site(site['name']), self.stop_event,
+                                   tick_interval, checkpoint_interval) for site in sites]
+        self.server = ThreadingHTTPServer((host, port), StatusHandler)
+        self.server.daemon_threads = True
+        self.server.indexer_daemon = self
+
+    def healthy(self):
+        return all(worker.healthy() for worker in self.workers)
+
+    def status(self):
+        return {
+            'started_at': isoformat(self.started),
+            'uptime': round(time.time() - self.started),
+            'healthy': self.healthy(),
+            'sites': {worker.name: worker.status() for worker in self.workers},
+        }
+
+    def write_report(self):
+        self.metrics.write_report(os.path.join(DATA_DIR, REPORT_FILE))
+        if self.prometheus_path:
+            self.metrics.write_prometheus(self.prometheus_path)
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        threading.Thread(target=self.server.serve_forever, name='status-server', daemon=True).start()
+        host, port = self.server.server_address[:2]
+        print(f"Indexing daemon started for {', '.join(worker.name for worker in self.workers)}, "
+              f"status on http://{host}:{port}/status")
+        for worker in self.workers:
+            worker.start()
+        try:
+            while not self.stop_event.wait(self.checkpoint_interval):
+                self.write_report()
+        finally:
+            # Сайты дорабатывают текущий цикл и сохраняют состояние
+            print("Stopping indexing daemon")
+            self.stop_event.set()
+            for worker in self.workers:
+                worker.thread.join()
+            self.server.shutdown()
+            self.server.server_close()
+            self.write_report()
+
+
+def run_daemon(sites, port=STATUS_PORT, tick_interval=TICK_INTERVAL, checkpoint_interval=CHECKPOINT_INTERVAL,
+               prometheus_path=None, host=STATUS_HOST):
+    IndexerDaemon(sites, host, port, tick_interval, checkpoint_interval, prometheus_path).run()
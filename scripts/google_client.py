@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+from link_store import DATA_DIR
+from transport import create_session, get_api_http
+
+SCOPES = ['https://www.googleapis.com/auth/indexing']
+DISCOVERY_URL = 'https://indexing.googleapis.com/$discovery/rest?version=v3'
+DISCOVERY_CACHE_FILE = 'indexing_v3_discovery.json'
+# Адрес API можно подменить, например на локальный стенд из benchmarks/
+ENDPOINT_ENV = 'INDEXING_API_ENDPOINT'
+
+_lock = threading.Lock()
+_discovery_document = None
+_credentials = {}
+
+
+def load_discovery_document(data_dir=DATA_DIR):
+    # Документ берётся из google-api-python-client (static discovery), а для старых версий
+    # библиотеки один раз скачивается и кэшируется на диске - без сетевого запроса на каждый запуск
+    global _discovery_document
+    with _lock:
+        if _discovery_document is not None:
+            return _discovery_document
+        document = None
+        try:
+            from googleapiclient.discovery_cache import get_static_doc
+            document = get_static_doc('indexing', 'v3')
+        except ImportError:
+            pass
+        cache_path = os.path.join(data_dir, DISCOVERY_CACHE_FILE)
+        if document is None and os.path.exists(cache_path):
+            with open(cache_path, 'r') as f:
+                document = f.read()
+        if document is None:
+            print(f"Fetching discovery document from {DISCOVERY_URL}")
+            response = create_session(1).get(DISCOVERY_URL)
+            response.raise_for_status()
+            document = response.text
+            with open(cache_path, 'w') as f:
+                f.write(document)
+        _discovery_document = override_endpoint(json.loads(document), os.getenv(ENDPOINT_ENV))
+        return _discovery_document
+
+
+def override_endpoint(document, endpoint):
+    # batch-запросы строятся от rootUrl документа и не учитывают api_endpoint клиента,
+    # поэтому адрес меняется в самом документе
+    if not endpoint:
+        return document
+    root_url = endpoint.rstrip('/') + '/'
+    print(f"Using Indexing API endpoint {root_url}")
+    return {**document, 'rootUrl': root_url, 'mtlsRootUrl': root_url,
+            'baseUrl': root_url + document.get('servicePath', '')}
+
+
+def parse_credentials(credentials_json, site_name):
+    if not credentials_json:
+        raise ValueError(f"Missing credentials for {site_name}")
+    try:
+        return json.loads(credentials_json)
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON for {site_name}: {e}")
+        raise
+
+
+def get_credentials(credentials_json, site_name):
+    # Одни и те же учётные данные (и полученный токен) используются всеми сайтами и вызовами.
+    # Библиотеки Google импортируются при первом обращении к API, а не при импорте модуля
+    from google.oauth2 import service_account
+
+    with _lock:
+        credentials = _credentials.get(credentials_json)
+        if credentials is None:
+            credentials_data = parse_credentials(credentials_json, site_name)
+            credentials = service_account.Credentials.from_service_account_info(credentials_data, scopes=SCOPES)
+            _credentials[credentials_json] = credentials
+            print(f"Loaded credentials for {site_name}")
+        return credentials
+
+
+def get_service(credentials_json, site_name):
+    # Сборка клиента не делает сетевых запросов: документ и учётные данные берутся из кэша.
+    # Запросы идут через общий пул соединений этих учётных данных (transport.SessionHttp),
+    # поэтому клиент можно использовать из нескольких потоков
+    from googleapiclient.discovery import build_from_document
+
+    credentials = get_credentials(credentials_json, site_name)
+    try:
+        return build_from_document(load_discovery_document(), http=get_api_http(credentials))
+    except Exception as e:
+        print(f"Error loading credentials for {site_name}: {e}")
+        raise
+
+
+def get_account(credentials_json, site_name):
+    # Адрес сервисного аккаунта берётся прямо из JSON: для журнала квоты клиент Google не нужен
+    account = parse_credentials(credentials_json, site_name).get('client_email')
+    if not account:
+        raise ValueError(f"No client_email in credentials for {site_name}")
+    return account
@@ -1,247 +0,0 @@
-import requests
-import os
-import json
-import time
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from xml.etree import ElementTree as ET
-from googleapiclient.errors import HttpError
-from google.auth.exceptions import RefreshError
-
-SCOPES = ['https://www.googleapis.com/auth/indexing']
-VITRINA24KZ_CREDENTIALS = os.getenv('VITRINA24KZ_CREDENTIALS')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-
-DATA_DIR = 'data'
-os.makedirs(DATA_DIR, exist_ok=True)
-
-if not TELEGRAM_TOKEN:
-    raise ValueError("Missing Telegram token")
-else:
-    print(f"Telegram token is set: {TELEGRAM_TOKEN[:4]}...")
-
-if not VITRINA24KZ_CREDENTIALS:
-    raise ValueError("Missing VITRINA24KZ_CREDENTIALS")
-else:
-    print(f"VITRINA24KZ_CREDENTIALS is set")
-    print(f"VITRINA24KZ_CREDENTIALS content: {VITRINA24KZ_CREDENTIALS[:100]}...")  # Выводим первые 100 символов
-
-def get_service(credentials_json, site_name):
-    if not credentials_json:
-        raise ValueError(f"Missing credentials for {site_name}")
-    try:
-        credentials_data = json.loads(credentials_json)
-        print(f"Loaded credentials for {site_name}")
-        with open(f'temp_credentials_{site_name}.json', 'w') as f:
-            json.dump(credentials_data, f)
-        credentials = service_account.Credentials.from_service_account_file(
-            f'temp_credentials_{site_name}.json', scopes=SCOPES)
-        service = build('indexing', 'v3', credentials=credentials)
-        os.remove(f'temp_credentials_{site_name}.json')
-        return service
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON for {site_name}: {e}")
-        raise
-    except Exception as e:
-        print(f"Error loading credentials for {site_name}: {e}")
-        raise
-
-def check_quota(service, site):
-    try:
-        response = service.urlNotifications().getMetadata(url=f"https://{site}").execute()
-        print(f"Quota check response: {response}")
-        return True
-    except HttpError as e:
-        if e.resp.status == 429:
-            print(f"Quota exceeded for {site}")
-            return False
-        elif e.resp.status == 503:
-            print(f"Service unavailable for {site}, skipping.")
-            return False
-        else:
-            print(f"Error checking quota for {site}: {e}")
-            return False
-    except RefreshError as e:
-        print(f"Refresh error while checking quota for {site}: {e}")
-        return False
-
-def index_url(service, url):
-    body = {
-        "url": url,
-        "type": "URL_UPDATED"
-    }
-    try:
-        response = service.urlNotifications().publish(body=body).execute()
-        print(f"Indexed {url}: {response}")
-        return response
-    except HttpError as e:
-        if e.resp.status == 429:
-            print(f"Quota exceeded while indexing {url}")
-            return 'QUOTA_EXCEEDED'
-        elif e.resp.status == 503:
-            print(f"Service unavailable while indexing {url}")
-            return 'SERVICE_UNAVAILABLE'
-        print(f"Error indexing {url}: {e}")
-        return None
-    except RefreshError as e:
-        print(f"Refresh error while indexing {url}: {e}")
-        return None
-
-def load_links(file_path):
-    full_path = os.path.join(DATA_DIR, file_path)
-    print(f"Attempting to load links from {full_path}")
-    if os.path.exists(full_path):
-        with open(full_path, 'r') as file:
-            print(f"Loaded links from {full_path}")
-            return [line.strip() for line in file.readlines()]
-    print(f"No links found in {full_path}, creating new file.")
-    with open(full_path, 'w') as file:
-        pass
-    return []
-
-def save_links(file_path, links):
-    full_path = os.path.join(DATA_DIR, file_path)
-    print(f"Saving links to {full_path}")
-    with open(full_path, 'w') as file:
-        file.writelines(f"{link}\n" for link in links)
-    print(f"Saved links to {full_path}")
-
-def fetch_sitemap_links(sitemap_url):
-    print(f"Fetching sitemap links from {sitemap_url}")
-    try:
-        response = requests.get(sitemap_url)
-        if response.status_code == 200:
-            root = ET.fromstring(response.content)
-            links = []
-            for elem in root:
-                if elem.tag.endswith('sitemap'):
-                    for loc in elem:
-                        if loc.tag.endswith('loc'):
-                            links += fetch_sitemap_links(loc.text)
-                elif elem.tag.endswith('url'):
-                    for loc in elem:
-                        if loc.tag.endswith('loc'):
-                            links.append(loc.text)
-            print(f"Fetched {len(links)} links from {sitemap_url}")
-            return links
-        else:
-            print(f"Failed to fetch sitemap from {sitemap_url}, status code: {response.status_code}")
-    except Exception as e:
-        print(f"Error fetching sitemap from {sitemap_url}: {e}")
-    return []
-
-def send_telegram_message(message):
-    print(f"Sending Telegram message: {message}")
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    data = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message
-    }
-    response = requests.post(url, data=data)
-    print(f"Telegram response: {response.json()}")
-    return response
-
-def log_error(file_path, url, error_message):
-    full_path = os.path.join(DATA_DIR, file_path)
-    with open(full_path, 'a') as f:
-        f.write(f"{url}: {error_message}\n")
-    print(f"Logged error for {url}: {error_message}")
-
-def process_links(service, links_to_index, indexed_links, failed_links, site, limit):
-    indexed_count = 0
-    for i, url in enumerate(links_to_index):
-        if indexed_count >= limit:
-            break
-        if url not in indexed_links and url not in failed_links:
-            print(f"Indexing URL: {url}")
-            response = index_url(service, url)
-            if response == 'QUOTA_EXCEEDED' or response == 'SERVICE_UNAVAILABLE':
-                print(f"Quota exceeded or service unavailable during processing {site}, stopping.")
-                send_telegram_message(f"Quota exceeded or service unavailable during processing {site}, stopping.")
-                break
-            time.sleep(1)  # Задержка между запросами для предотвращения превышения квоты
-            if response:
-                indexed_links.append(url)
-                indexed_count += 1
-            else:
-                failed_links.append(url)
-                log_error(f'failed_links_errors_{site}.txt', url, 'Indexing failed')
-
-            # Проверка квоты каждые 100 ссылок
-            if (i + 1) % 100 == 0:
-                if not check_quota(service, site):
-                    print(f"Quota exceeded during processing {site}, stopping.")
-                    send_telegram_message(f"Quota exceeded during processing {site}, stopping.")
-                    break
-
-    print(f"{site} - отправлено {indexed_count} ссылок из {limit}.")
-    return indexed_count
-
-def process_site(site, credentials, links_to_index_file, indexed_links_file, failed_links_file, sitemap_url, limit):
-    try:
-        service = get_service(credentials, site)
-    except ValueError as e:
-        print(f"Error: {e}")
-        send_telegram_message(f"Indexing process for {site} failed: {e}")
-        return 0
-    except Exception as e:
-        print(f"Unexpected error creating service for {site}: {e}")
-        send_telegram_message(f"Unexpected error creating service for {site}: {e}")
-        return 0
-
-    if not check_quota(service, site):
-        print(f"Quota exceeded or service unavailable for {site}, skipping indexing.")
-        send_telegram_message(f"Quota exceeded or service unavailable for {site}, skipping indexing.")
-        return 0
-
-    indexed_links = load_links(indexed_links_file)
-    failed_links = load_links(failed_links_file)
-    links_to_index = load_links(links_to_index_file)
-
-    if not links_to_index:
-        links_to_index = fetch_sitemap_links(sitemap_url)
-        save_links(links_to_index_file, links_to_index)
-
-    print(f"Fetched {len(links_to_index)} links from {site}")
-
-    indexed_count = process_links(
-        service,
-        links_to_index,
-        indexed_links,
-        failed_links,
-        site,
-        limit
-    )
-
-    save_links(indexed_links_file, indexed_links)
-    save_links(failed_links_file, failed_links)
-    remaining_links = links_to_index[indexed_count:]
-    save_links(links_to_index_file, remaining_links)
-
-    return indexed_count
-
-def main():
-    print("Starting indexing process")
-
-    vitrina_indexed_count = process_site(
-        "vitrina24.kz",
-        VITRINA24KZ_CREDENTIALS,
-        'links_to_index_vitrina.txt',
-        'indexed_links_vitrina.txt',
-        'failed_links_vitrina.txt',
-        'https://vitrina24.kz/sitemap.xml',
-        200
-    )
-
-    print(f"Indexing process completed, {vitrina_indexed_count} links indexed")
-
-    # Отправка сообщения в Telegram
-    message = (
-        f"vitrina24.kz - отправлено {vitrina_indexed_count} ссылок из 200."
-    )
-    send_telegram_message(message)
-
-if __name__ == "__main__":
-    main()
- 
@@ -0,0 +1,622 @@
+import argparse
+import math
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from google_client import get_account, get_service
+from link_store import DATA_DIR, LinkStore
+from liveness import (GONE, GONE_TTL, LIVE, LIVENESS_TTL, LIVENESS_WORKERS, REDIRECT, LivenessCache,
+                      LivenessChecker, same_site)
+from metrics import REPORT_FILE, RunMetrics, SiteMetrics
+from notifier import get_notifier
+from publisher import DEFAULT_BURST, DEFAULT_RATE, DEFAULT_WORKERS, MAX_BATCH_SIZE, publish_links
+from quota_ledger import DEFAULT_DAILY_QUOTA, QuotaLedger
+from rate_limiter import TokenBucket
+from retry_state import DEFAULT_MAX_ATTEMPTS, RetryState
+from scheduler import make_priority
+from sitemap import SitemapState, iter_sitemap_links, refresh_links
+from transport import create_session
+from urls import make_canonicalizer
+
+TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+
+DEFAULT_CONFIG = 'sites.json'
+# Сколько первых ссылок плана показывать в --plan
+PLAN_SHOW = 20
+SITE_DEFAULTS = {
+    # limit - необязательный верхний предел за запуск; по умолчанию используется весь остаток дневной квоты
+    'limit': None,
+    'daily_quota': DEFAULT_DAILY_QUOTA,
+    'batch_size': MAX_BATCH_SIZE,
+    'workers': DEFAULT_WORKERS,
+    'rate': DEFAULT_RATE,
+    'burst': DEFAULT_BURST,
+    'incremental': True,
+    'priority': True,
+    'max_attempts': DEFAULT_MAX_ATTEMPTS,
+    # Правила приведения ссылок к каноническому виду, см. urls.DEFAULT_URL_RULES
+    'canonical': {},
+    # Предварительная проверка страниц HEAD-запросами: удалённые, редиректы и noindex не тратят квоту
+    'liveness': False,
+    'liveness_workers': LIVENESS_WORKERS,
+    'liveness_ttl': LIVENESS_TTL,
+    # Режим службы (--daemon): как часто проверять sitemap, секунды
+    'sitemap_interval': 3600,
+}
+# Имена файлов состояния по умолчанию строятся из data_suffix сайта
+SITE_FILES = {
+    'links_to_index_file': 'links_to_index_{suffix}.txt',
+    'indexed_links_file': 'indexed_links_{suffix}.txt',
+    'failed_links_file': 'failed_links_{suffix}.txt',
+    'journal_file': 'journal_{suffix}.log',
+    'sitemap_cache_file': 'sitemap_cache_{suffix}.json',
+    'lastmod_file': 'sitemap_lastmod_{suffix}.tsv',
+    'lastmod_journal_file': 'sitemap_lastmod_{suffix}.log',
+    'retry_file': 'retry_state_{suffix}.json',
+    'liveness_file': 'liveness_{suffix}.json',
+}
+REQUIRED_SITE_KEYS = ('name', 'sitemap_url', 'credentials_env', 'data_suffix')
+
+def load_sites(config_path, only=None):
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    defaults = {**SITE_DEFAULTS, **config.get('defaults', {})}
+    sites = []
+    for entry in config['sites']:
+        missing = [key for key in REQUIRED_SITE_KEYS if key not in entry]
+        if missing:
+            raise ValueError(f"Site config {entry} is missing {', '.join(missing)}")
+        if only and entry['name'] not in only:
+            continue
+        site = {**defaults, **entry}
+        # credentials_env - переменная окружения или список переменных (пул сервисных аккаунтов)
+        credentials_env = site['credentials_env']
+        site['credentials_envs'] = [credentials_env] if isinstance(credentials_env, str) else list(credentials_env)
+        for key, pattern in SITE_FILES.items():
+            site.setdefault(key, pattern.format(suffix=site['data_suffix']))
+        sites.append(site)
+    if not sites:
+        raise ValueError(f"No sites to process in {config_path}")
+    return sites
+
+def check_quota(service, site):
+    from googleapiclient.errors import HttpError
+    from google.auth.exceptions import RefreshError
+
+    try:
+        response = service.urlNotifications().getMetadata(url=f"https://{site}").execute()
+        print(f"Quota check response: {response}")
+        return True
+    except HttpError as e:
+        if e.resp.status == 429:
+            print(f"Quota exceeded for {site}")
+            return False
+        elif e.resp.status == 503:
+            print(f"Service unavailable for {site}, skipping.")
+            return False
+        else:
+            print(f"Error checking quota for {site}: {e}")
+            return False
+    except RefreshError as e:
+        print(f"Refresh error while checking quota for {site}: {e}")
+        return False
+
+def fetch_sitemap_links(sitemap_url, session=None, canonicalize=None, metrics=None):
+    links = list(iter_sitemap_links(sitemap_url, session, canonicalize=canonicalize, metrics=metrics))
+    print(f"Fetched {len(links)} links from {sitemap_url}")
+    return links
+
+def send_telegram_message(message):
+    # Сообщение отправляется в фоне и не задерживает обработку ссылок
+    print(f"Sending Telegram message: {message}")
+    get_notifier().notify(message)
+
+def log_error(file_path, url, error_message):
+    full_path = os.path.join(DATA_DIR, file_path)
+    with open(full_path, 'a') as f:
+        f.write(f"{url}: {error_message}\n")
+    print(f"Logged error for {url}: {error_message}")
+
+def process_links(service, store, site, limit, batch_size=1, workers=1, bucket=None, on_indexed=None, ledger=None,
+                  account=None, retry_state=None, metrics=None, liveness=None, was_published=None):
+    counts = {'indexed': 0, 'processed': 0}
+    leased = {}
+    # Удалённые страницы, о которых Google уже знает: для них отправляется URL_DELETED
+    deleted = set()
+
+    def defer(url, result, delay, reason):
+        # Удалённая страница или источник редиректа не уходит в dead-letter: ссылка остаётся
+        # в очереди и проверяется снова, когда истечёт результат проверки
+        if retry_state:
+            retry_state.defer(url, f"{result.state}_{result.status}", delay)
+        if metrics:
+            metrics.count('links_deferred')
+        log_error(f'failed_links_errors_{site}.txt', url, f"{reason}, deferred")
+
+    def live_candidates(is_eligible):
+        # Перед отправкой страницы проверяются параллельно; в publish уходят только живые
+        # канонические страницы и уведомления об удалении ранее отправленных.
+        # Цели редиректов ставятся в очередь и проверяются следующим проходом.
+        redirected = True
+        while redirected:
+            redirected = False
+            for url, result in liveness.iter_checked(store.iter_pending(leased, is_eligible)):
+                if metrics:
+                    metrics.count(f'liveness_{result.state}')
+                if result.state == LIVE:
+                    yield url
+                elif result.state == GONE:
+                    if was_published and was_published(url):
+                        deleted.add(url)
+                        yield url
+                    else:
+                        defer(url, result, GONE_TTL, f"Page is gone ({result.status}) and was never published")
+                elif result.state == REDIRECT:
+                    defer(url, result, liveness.cache.ttl, f"Redirects ({result.status}) to {result.target}")
+                    target = result.target
+                    if same_site(url, target) and target not in leased and not store.is_processed(target):
+                        store.add_pending(target)
+                        redirected = True
+                # noindex и недоступные сейчас страницы остаются в очереди до следующей проверки
+
+    def on_result(url, response):
+        counts['processed'] += 1
+        if response:
+            leased.pop(url, None)
+            store.mark_indexed(url)
+            counts['indexed'] += 1
+            if url in deleted and metrics:
+                metrics.count('links_deleted')
+            if ledger:
+                ledger.record_published(account)
+            if retry_state:
+                retry_state.clear(url)
+            if on_indexed:
+                on_indexed(url)
+            return False
+
+        status = getattr(response, 'status', None)
+        if retry_state and not retry_state.record_failure(url, status):
+            # Ссылка остаётся в leased и вернётся в очередь для повтора в следующих запусках
+            log_error(f'failed_links_errors_{site}.txt', url,
+                      f"Indexing failed ({status}), attempt {retry_state.attempts(url)}, will retry")
+            if metrics:
+                metrics.count('links_retry_later')
+            return False
+        leased.pop(url, None)
+        store.mark_failed(url)
+        if metrics:
+            metrics.count('links_dead_lettered')
+        log_error(f'failed_links_errors_{site}.txt', url, f"Indexing failed ({status}), moved to dead-letter")
+        return False
+
+    is_eligible = retry_state.is_eligible if retry_state else None
+    if liveness:
+        candidates = live_candidates(is_eligible)
+    else:
+        candidates = store.iter_pending(leased, is_eligible)
+    try:
+        stop_reason = publish_links(service, candidates, limit, on_result, bucket, batch_size, workers, metrics,
+                                    lambda url: 'URL_DELETED' if url in deleted else 'URL_UPDATED')
+    finally:
+        # Дожидаемся проверок, начатых с опережением
+        candidates.close()
+        # Ссылки без результата (остановка по квоте, ошибка) возвращаются в начало очереди
+        store.release(leased)
+    if stop_reason == 'QUOTA_EXCEEDED' and ledger:
+        ledger.record_rate_limited(account)
+
+    indexed_count = counts['indexed']
+    if metrics:
+        metrics.count('links_indexed', indexed_count)
+        if stop_reason:
+            metrics.set('stop_reason', stop_reason)
+    print(f"{site} - отправлено {indexed_count} ссылок из {limit}" + (f" с {account}." if account else "."))
+    return indexed_count, stop_reason
+
+def read_accounts(site):
+    # Пул сервисных аккаунтов сайта: все они - владельцы одного ресурса в Search Console,
+    # и у каждого своя дневная квота. Один аккаунт в нескольких переменных используется один раз.
+    # Здесь только разбираются учётные данные, клиент API создаётся в open_services
+    accounts = {}
+    for credentials_env in site['credentials_envs']:
+        label = site['name'] if len(site['credentials_envs']) == 1 else f"{site['name']} ({credentials_env})"
+        try:
+            account = get_account(os.getenv(credentials_env), label)
+        except ValueError as e:
+            print(f"Error: {e}")
+            send_telegram_message(f"Indexing process for {label} failed: {e}")
+            continue
+        accounts.setdefault(account, os.getenv(credentials_env))
+    return list(accounts.items())
+
+def remaining_budget(site, accounts, ledger):
+    # Сколько сайт может отправить сегодня, без резервирования: для решения, пропускать ли сайт
+    budget = sum(ledger.remaining(account, site['daily_quota']) for account, _ in accounts)
+    return budget if site['limit'] is None else min(budget, site['limit'])
+
+def reserve_budgets(site, accounts, ledger, wanted=None):
+    # Сначала аккаунты с наибольшим остатком квоты; limit ограничивает сайт в целом.
+    # wanted - сколько ссылок сейчас можно отправить: больше сайт не резервирует,
+    # чтобы не отнимать квоту общего аккаунта у других сайтов
+    accounts = sorted(accounts, key=lambda item: ledger.remaining(item[0], site['daily_quota']), reverse=True)
+    limit = site['limit']
+    if wanted is not None:
+        limit = wanted if limit is None else min(limit, wanted)
+    budgets = []
+    for account, credentials_json in accounts:
+        if limit == 0:
+            break
+        granted = ledger.reserve(account, site['daily_quota'], limit)
+        if not granted:
+            print(f"Daily quota of {account} is used up for {site['name']}: {ledger.usage(account)}")
+            continue
+        budgets.append((account, credentials_json, granted))
+        if limit is not None:
+            limit -= granted
+    return budgets
+
+def open_services(site, budgets, ledger, metrics):
+    # Клиенты API (и импорт библиотек Google) - только когда в очереди есть что отправлять
+    name = site['name']
+    services = []
+    for account, credentials_json, granted in budgets:
+        try:
+            with metrics.phase('get_service'):
+                service = get_service(credentials_json, name)
+        except Exception as e:
+            print(f"Unexpected error creating service for {name} with {account}: {e}")
+            send_telegram_message(f"Unexpected error creating service for {name} with {account}: {e}")
+            continue
+        # Проверочный запрос к API нужен, только если по аккаунту ещё нет данных в журнале квоты
+        if not ledger.has_data(account):
+            with metrics.phase('quota_probe'):
+                if not check_quota(service, name):
+                    print(f"Quota exceeded or service unavailable for {name} with {account}, skipping the account.")
+                    continue
+        services.append((account, service, granted))
+    return services
+
+def process_site(site, ledger, session=None, metrics=None):
+    name = site['name']
+    metrics = metrics or SiteMetrics(name)
+    accounts = read_accounts(site)
+    if not accounts:
+        return 0, 0
+
+    # Остаток квоты берётся из журнала: если он исчерпан, сайт пропускается без обращения к API и sitemap.
+    # Квота резервируется позже, когда известно, сколько ссылок ждёт отправки
+    if not remaining_budget(site, accounts, ledger):
+        print(f"Daily quota is used up for {name}, skipping indexing.")
+        return 0, 0
+    try:
+        return process_site_links(site, accounts, ledger, session, metrics)
+    finally:
+        ledger.save()
+
+def load_site_state(site, read_only=False):
+    sitemap_state = None
+    if site['incremental']:
+        sitemap_state = SitemapState(site['sitemap_cache_file'], site['lastmod_file'],
+                                     journal_file=site['lastmod_journal_file']).load()
+
+    retry_state = RetryState(site['retry_file'], max_attempts=site['max_attempts']).load()
+    canonicalize = make_canonicalizer(site['canonical'])
+
+    # Очередь с приоритетами: новые товары и свежий lastmod отправляются первыми, повторы - последними
+    store = LinkStore(
+        site['indexed_links_file'],
+        site['failed_links_file'],
+        site['links_to_index_file'],
+        site['journal_file'],
+        priority=make_priority(sitemap_state, retry_state.attempts) if site['priority'] else None,
+        canonicalize=canonicalize,
+        read_only=read_only
+    ).load()
+    return sitemap_state, retry_state, store, canonicalize
+
+def load_liveness(site, canonicalize, session=None):
+    if not site['liveness']:
+        return None
+    cache = LivenessCache(site['liveness_file'], ttl=site['liveness_ttl']).load()
+    return LivenessChecker(session or create_session(), cache, canonicalize, site['liveness_workers'])
+
+def save_site_state(store, retry_state, sitemap_state=None, liveness=None):
+    store.checkpoint()
+    retry_state.save()
+    if sitemap_state:
+        sitemap_state.save()
+    if liveness:
+        liveness.cache.save()
+
+def refresh_site_links(site, sitemap_state, store, canonicalize, session=None, metrics=None):
+    # Инкрементальный режим: sitemap проверяется каждый запуск условными запросами
+    new_links, updated_links = 0, 0
+    if sitemap_state:
+        new_links, updated_links = refresh_links(site['sitemap_url'], sitemap_state, store, session, canonicalize,
+                                                 metrics)
+    elif not store.pending:
+        for url in fetch_sitemap_links(site['sitemap_url'], session, canonicalize, metrics):
+            store.add_pending(url)
+            new_links += 1
+    return new_links, updated_links
+
+def count_pending_links(store, retry_state, limit=None):
+    # Сколько ссылок в очереди можно отправить сейчас; подсчёт останавливается на limit
+    count = 0
+    for url in store.pending:
+        if limit is not None and count >= limit:
+            break
+        if not store.is_processed(url) and retry_state.is_eligible(url):
+            count += 1
+    return count
+
+def publish_site_links(site, services, store, sitemap_state, retry_state, ledger, liveness=None, metrics=None):
+    # services - [(аккаунт, клиент API, бюджет)]: аккаунты используются по очереди,
+    # следующий - когда у предыдущего кончился бюджет или пришёл 429
+    name = site['name']
+    metrics = metrics or SiteMetrics(name)
+    indexed_count = 0
+    stop_reason = None
+    for position, (account, service, budget) in enumerate(services, 1):
+        count, stop_reason = process_links(
+            service,
+            store,
+            name,
+            budget,
+            site['batch_size'],
+            site['workers'],
+            TokenBucket(site['rate'], site['burst']),
+            sitemap_state.mark_published if sitemap_state else None,
+            ledger,
+            account,
+            retry_state,
+            metrics,
+            liveness,
+            (lambda url: sitemap_state.get(url)[1] is not None) if sitemap_state else None
+        )
+        indexed_count += count
+        metrics.record_account(account, budget, count, stop_reason == 'QUOTA_EXCEEDED')
+        if stop_reason == 'QUOTA_EXCEEDED':
+            # Ссылки без ответа вернулись в начало очереди и уйдут через следующий аккаунт
+            if position < len(services):
+                print(f"{account} hit the quota while processing {name}, failing over to the next account")
+            continue
+        if stop_reason or count < budget:
+            break
+    if stop_reason in ('QUOTA_EXCEEDED', 'SERVICE_UNAVAILABLE'):
+        print(f"Quota exceeded or service unavailable during processing {name}, stopping.")
+        send_telegram_message(f"Quota exceeded or service unavailable during processing {name}, stopping.")
+    return indexed_count
+
+def process_site_links(site, accounts, ledger, session=None, metrics=None):
+    # accounts - [(аккаунт, учётные данные)] из read_accounts.
+    # Возвращает (число отправленных ссылок, зарезервированный бюджет)
+    name = site['name']
+    metrics = metrics or SiteMetrics(name)
+
+    with metrics.phase('load'):
+        sitemap_state, retry_state, store, canonicalize = load_site_state(site)
+        liveness = load_liveness(site, canonicalize, session)
+
+    with metrics.phase('sitemap'):
+        new_links, updated_links = refresh_site_links(site, sitemap_state, store, canonicalize, session, metrics)
+        metrics.count('sitemap_new_links', new_links)
+        metrics.count('sitemap_updated_links', updated_links)
+
+    print(f"Fetched {len(store.pending)} links from {name}")
+    metrics.set('indexed_links', len(store.indexed))
+    metrics.set('pending_links_before', len(store.pending))
+
+    budgets = []
+    try:
+        services = []
+        # Пока обновлялся sitemap, квоту общего аккаунта могли зарезервировать другие сайты
+        available = remaining_budget(site, accounts, ledger)
+        wanted = count_pending_links(store, retry_state, available)
+        if not available:
+            print(f"Daily quota is used up for {name}, skipping indexing.")
+        elif not wanted:
+            print(f"No links to publish for {name}, skipping the API")
+        else:
+            budgets = reserve_budgets(site, accounts, ledger, wanted)
+            for account, _, granted in budgets:
+                print(f"{name} can publish {granted} links today with {account}")
+            metrics.set('budget', sum(granted for _, _, granted in budgets))
+            services = open_services(site, budgets, ledger, metrics) if budgets else []
+            if not services:
+                print(f"Quota exceeded or service unavailable for {name}, skipping indexing.")
+                send_telegram_message(f"Quota exceeded or service unavailable for {name}, skipping indexing.")
+        with metrics.phase('publish'):
+            indexed_count = publish_site_links(site, services, store, sitemap_state, retry_state, ledger, liveness,
+                                               metrics)
+    finally:
+        with metrics.phase('save'):
+            save_site_state(store, retry_state, sitemap_state, liveness)
+        metrics.set('pending_links_after', len(store.pending))
+        metrics.count('state_bytes_read', store.bytes_read)
+        metrics.count('state_bytes_written', store.bytes_written)
+        for account, _, granted in budgets:
+            ledger.release(account, granted)
+
+    return indexed_count, sum(granted for _, _, granted in budgets)
+
+def plan_site(site, ledger, session=None):
+    # То же, что делает запуск до первого запроса к API: загрузка состояния, проверка sitemap
+    # (условными запросами по кэшу) и фильтры очереди. Файлы состояния не меняются.
+    name = site['name']
+    accounts = []
+    for credentials_env in site['credentials_envs']:
+        credentials_json = os.getenv(credentials_env)
+        if not credentials_json:
+            continue
+        try:
+            account = get_account(credentials_json, name)
+        except Exception as e:
+            print(f"Cannot read credentials for {name} from {credentials_env}: {e}")
+            continue
+        if account not in accounts:
+            accounts.append(account)
+    if accounts:
+        budget = sum(ledger.remaining(account, site['daily_quota']) for account in accounts)
+        account_names = accounts
+    else:
+        # Без учётных данных (например, локально) считаем, что квота всех аккаунтов пула свободна
+        accounts = site['credentials_envs']
+        budget = site['daily_quota'] * len(accounts)
+        account_names = [f"{credentials_env} (not set)" for credentials_env in accounts]
+    if site['limit'] is not None:
+        budget = min(budget, site['limit'])
+
+    sitemap_state, retry_state, store, canonicalize = load_site_state(site, read_only=True)
+    pending_before = len(store.pending)
+    new_links, updated_links = refresh_site_links(site, sitemap_state, store, canonicalize, session)
+
+    plan = []
+    deferred = 0
+    for url in store.pending.ordered():
+        if store.is_processed(url):
+            continue
+        if not retry_state.is_eligible(url):
+            deferred += 1
+            continue
+        if retry_state.attempts(url):
+            kind = 'retry'
+        elif sitemap_state and sitemap_state.get(url)[1] is not None:
+            kind = 'resubmit'
+        else:
+            kind = 'new'
+        plan.append((kind, url))
+
+    return {
+        'site': site,
+        'account': ', '.join(account_names),
+        'budget': budget,
+        # Сколько ссылок в сутки пропускает весь пул аккаунтов
+        'daily_capacity': site['daily_quota'] * len(accounts),
+        'pending_before': pending_before,
+        'new_links': new_links,
+        'updated_links': updated_links,
+        'deferred': deferred,
+        'failed': len(store.failed),
+        'indexed': len(store.indexed),
+        'plan': plan,
+    }
+
+def days_to_drain(links, remaining_today, daily_quota):
+    # Считая сегодняшний день: сегодня уходит остаток квоты, дальше - по daily_quota в сутки
+    if not links:
+        return 0
+    if daily_quota <= 0:
+        return None
+    return 1 + math.ceil(max(0, links - remaining_today) / daily_quota)
+
+def print_plan(result, show=PLAN_SHOW):
+    site = result['site']
+    plan = result['plan']
+    today = plan[:result['budget']]
+    kinds = {kind: sum(1 for k, _ in plan if k == kind) for kind in ('new', 'resubmit', 'retry')}
+    # Первые burst запросов проходят сразу, остальные - со скоростью rate
+    seconds = max(0, len(today) - site['burst']) / site['rate']
+    days = days_to_drain(len(plan), result['budget'], result['daily_capacity'])
+    print(f"\nPlan for {site['name']} ({result['account']})")
+    print(f"  state:  {result['indexed']} indexed, {result['failed']} dead-lettered, "
+          f"{result['pending_before']} queued before the sitemap check")
+    print(f"  sitemap: {result['new_links']} new links, {result['updated_links']} changed since last publish")
+    print(f"  queue:  {len(plan)} to publish ({kinds['new']} new, {kinds['resubmit']} resubmits, "
+          f"{kinds['retry']} retries), {result['deferred']} waiting for retry backoff")
+    print(f"  today:  {len(today)} links within a budget of {result['budget']}, about {seconds:.0f}s "
+          f"at {site['rate']} requests/s in batches of {site['batch_size']}")
+    if days is None:
+        print("  drain:  daily quota is 0, the queue never drains")
+    else:
+        print(f"  drain:  {days} day(s) at {result['daily_capacity']} links/day")
+    for position, (kind, url) in enumerate(today[:show], 1):
+        print(f"  {position:5d}  {kind:<8}  {url}")
+    if len(today) > show:
+        print(f"  ... {len(today) - show} more today")
+
+def write_plan(results, path):
+    # Полный план: день (0 - сегодня), сайт, тип и ссылка, в порядке отправки
+    with open(path, 'w') as f:
+        for result in results:
+            site = result['site']
+            for position, (kind, url) in enumerate(result['plan']):
+                if position < result['budget']:
+                    day = 0
+                else:
+                    day = 1 + (position - result['budget']) // max(result['daily_capacity'], 1)
+                f.write(f"{day}\t{site['name']}\t{kind}\t{url}\n")
+    print(f"\nFull plan written to {path}")
+
+def plan(sites, plan_file=None):
+    session = create_session()
+    ledger = QuotaLedger().load()
+    with ThreadPoolExecutor(max_workers=len(sites)) as executor:
+        results = list(executor.map(lambda site: plan_site(site, ledger, session), sites))
+    for result in results:
+        print_plan(result)
+    if plan_file:
+        write_plan(results, plan_file)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit sitemap links of the configured sites to the Google Indexing API")
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help="site config file (default: sites.json)")
+    parser.add_argument('--site', action='append', help="process only this site, can be repeated")
+    parser.add_argument('--prometheus', metavar='PATH', help="also write run metrics in Prometheus text format")
+    parser.add_argument('--plan', action='store_true',
+                        help="show what the next run would publish without calling the API or changing state")
+    parser.add_argument('--plan-file', metavar='PATH', help="with --plan, write the full ordered plan as TSV")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running: watch sitemaps and publish whenever quota is available")
+    parser.add_argument('--status-port', type=int, default=8787,
+                        help="with --daemon, serve /health, /status and /metrics on 127.0.0.1:PORT (default: 8787)")
+    parser.add_argument('--interval', type=float, default=60,
+                        help="with --daemon, seconds between work cycles of each site (default: 60)")
+    args = parser.parse_args()
+
+    if args.plan:
+        plan(load_sites(args.config, args.site), args.plan_file)
+        return
+
+    if not TELEGRAM_TOKEN:
+        raise ValueError("Missing Telegram token")
+    print(f"Telegram token is set: {TELEGRAM_TOKEN[:4]}...")
+
+    sites = load_sites(args.config, args.site)
+    for site in sites:
+        missing = [env for env in site['credentials_envs'] if not os.getenv(env)]
+        for credentials_env in site['credentials_envs']:
+            print(f"{credentials_env} is {'missing' if credentials_env in missing else 'set'}")
+        if len(missing) == len(site['credentials_envs']):
+            print(f"No credentials for {site['name']}, it will be skipped")
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    if args.daemon:
+        from daemon import run_daemon
+        run_daemon(sites, args.status_port, args.interval, prometheus_path=args.prometheus)
+        return
+
+    print(f"Starting indexing process for {', '.join(site['name'] for site in sites)}")
+    # Все сайты обрабатываются параллельно в одном процессе с общим пулом HTTP-соединений
+    session = create_session()
+    ledger = QuotaLedger().load()
+    metrics = RunMetrics()
+    with ThreadPoolExecutor(max_workers=len(sites)) as executor:
+        results = list(executor.map(lambda site: process_site(site, ledger, session, metrics.site(site['name'])),
+                                    sites))
+
+    print(f"Indexing process completed, {sum(count for count, _ in results)} links indexed")
+    metrics.write_report(os.path.join(DATA_DIR, REPORT_FILE))
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+
+    # Отправка сообщения в Telegram
+    message = "\n".join(
+        f"{site['name']} - отправлено {count} ссылок из {budget}." for site, (count, budget) in zip(sites, results)
+    )
+    send_telegram_message(message)
+
+if __name__ == "__main__":
+    main()
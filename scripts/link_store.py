@@ -0,0 +1,304 @@
+import os
+from collections import OrderedDict
+
+from scheduler import PriorityLinkQueue
+from urls import UrlHashSet, url_hash
+
+DATA_DIR = 'data'
+# Журнал сворачивается в файлы-снимки, когда в нём накопилось столько записей
+COMPACT_THRESHOLD = 5000
+
+JOURNAL_INDEXED = 'I'
+JOURNAL_FAILED = 'F'
+JOURNAL_PENDING = 'P'
+JOURNAL_REINDEX = 'R'
+
+
+class LinkSet:
+    # Упорядоченное множество ссылок: порядок как в файле, проверка наличия за O(1)
+    def __init__(self, links=()):
+        self._links = dict.fromkeys(links)
+
+    def __contains__(self, url):
+        return url in self._links
+
+    def __iter__(self):
+        return iter(self._links)
+
+    def __len__(self):
+        return len(self._links)
+
+    def add(self, url):
+        self._links[url] = None
+
+    def discard(self, url):
+        self._links.pop(url, None)
+
+
+class LinkQueue(LinkSet):
+    # Очередь на отправку: взять первую ссылку, удалить любую и вернуть ссылки в начало - всё за O(1)
+    def __init__(self, links=()):
+        self._links = OrderedDict.fromkeys(links)
+
+    def popleft(self):
+        return self._links.popitem(last=False)[0]
+
+    def push_front(self, urls):
+        for url in reversed(urls):
+            self._links[url] = None
+            self._links.move_to_end(url, last=False)
+
+    def ordered(self):
+        return list(self._links)
+
+
+class LinkIndex:
+    # Проиндексированные ссылки: в памяти только 64-битные хэши, сами ссылки остаются
+    # в файле-снимке, а новые хранятся строками до следующего сворачивания журнала
+    def __init__(self, canonicalize=None):
+        self.canonicalize = canonicalize
+        self.hashes = UrlHashSet()
+        self.added = {}
+
+    def load(self, full_path):
+        self.hashes = UrlHashSet(iter_links(full_path, self.canonicalize))
+        return self
+
+    def __contains__(self, url):
+        return url in self.hashes
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, url):
+        value = url_hash(url)
+        if not self.hashes.contains_hash(value):
+            self.hashes.add_hash(value)
+            self.added[value] = url
+
+    def discard(self, url):
+        value = url_hash(url)
+        self.hashes.discard_hash(value)
+        self.added.pop(value, None)
+
+    def write_snapshot(self, full_path):
+        # Старый снимок читается построчно, удалённые ссылки и дубликаты пропускаются,
+        # новые дописываются в конец
+        written = set()
+
+        def links():
+            if os.path.exists(full_path):
+                for url in iter_links(full_path, self.canonicalize):
+                    value = url_hash(url)
+                    if value not in written and value not in self.added and self.hashes.contains_hash(value):
+                        written.add(value)
+                        yield url
+            yield from self.added.values()
+
+        size = write_links_atomic(full_path, links())
+        self.added = {}
+        return size
+
+
+def iter_links(full_path, canonicalize=None):
+    with open(full_path, 'r') as file:
+        for line in file:
+            url = line.strip()
+            if url and canonicalize:
+                url = canonicalize(url)
+            if url:
+                yield url
+
+
+def read_links(full_path, canonicalize=None):
+    return list(iter_links(full_path, canonicalize))
+
+
+def load_link_set(file_path, data_dir=DATA_DIR, canonicalize=None, create=True):
+    # Ссылки приводятся к каноническому виду, поэтому варианты одной страницы схлопываются
+    full_path = os.path.join(data_dir, file_path)
+    print(f"Attempting to load links from {full_path}")
+    if os.path.exists(full_path):
+        links = LinkSet(read_links(full_path, canonicalize))
+        print(f"Loaded {len(links)} links from {full_path}")
+        return links
+    if not create:
+        print(f"No links found in {full_path}")
+        return LinkSet()
+    print(f"No links found in {full_path}, creating new file.")
+    with open(full_path, 'w') as file:
+        pass
+    return LinkSet()
+
+
+def write_links_atomic(full_path, links):
+    # Снимок пишется во временный файл и подменяет старый одной операцией rename.
+    # Возвращает число записанных байт
+    tmp_path = f"{full_path}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.writelines(f"{link}\n" for link in links)
+        file.flush()
+        os.fsync(file.fileno())
+        size = file.tell()
+    os.replace(tmp_path, full_path)
+    return size
+
+
+class LinkStore:
+    # Общее состояние сайта: проиндексированные, ошибочные и ожидающие ссылки.
+    # Файлы-снимки меняются только при сворачивании журнала, а каждый результат
+    # сразу дописывается в журнал, поэтому прерванный запуск продолжается с того же места.
+    # В режиме read_only (планирование) состояние читается, но изменения остаются только в памяти.
+    def __init__(self, indexed_links_file, failed_links_file, links_to_index_file, journal_file=None,
+                 data_dir=DATA_DIR, priority=None, canonicalize=None, read_only=False):
+        self.data_dir = data_dir
+        self.indexed_links_file = indexed_links_file
+        self.failed_links_file = failed_links_file
+        self.links_to_index_file = links_to_index_file
+        self.journal_file = journal_file
+        # С функцией приоритета очередь выдаёт ссылки по приоритету, без неё - в порядке файла
+        self.priority = priority
+        self.canonicalize = canonicalize
+        self.read_only = read_only
+        self.indexed = LinkIndex(canonicalize)
+        self.failed = LinkSet()
+        self.pending = LinkQueue()
+        self.journal = None
+        self.journal_entries = 0
+        # Объём прочитанных и записанных файлов состояния, для отчёта о запуске
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def load(self):
+        self.indexed = self.load_index(self.indexed_links_file)
+        create = not self.read_only
+        self.failed = load_link_set(self.failed_links_file, self.data_dir, self.canonicalize, create)
+        pending = load_link_set(self.links_to_index_file, self.data_dir, self.canonicalize, create)
+        self.pending = PriorityLinkQueue(pending, self.priority) if self.priority else LinkQueue(pending)
+        if self.journal_file:
+            self.replay_journal()
+        self.bytes_read = sum(os.path.getsize(self.path(file_path)) for file_path in self.state_files()
+                              if os.path.exists(self.path(file_path)))
+        # Уже обработанные ссылки убираются из очереди один раз при загрузке,
+        # чтобы запуск начинался с первой необработанной ссылки
+        stale = [url for url in self.pending if self.is_processed(url)]
+        for url in stale:
+            self.pending.discard(url)
+        if stale:
+            print(f"Dropped {len(stale)} already processed links from the queue")
+        return self
+
+    def load_index(self, file_path):
+        full_path = self.path(file_path)
+        if not os.path.exists(full_path):
+            if self.read_only:
+                print(f"No links found in {full_path}")
+                return LinkIndex(self.canonicalize)
+            print(f"No links found in {full_path}, creating new file.")
+            open(full_path, 'w').close()
+        index = LinkIndex(self.canonicalize).load(full_path)
+        print(f"Loaded {len(index)} links from {full_path} ({index.hashes.memory_size() // 1024} KiB index)")
+        return index
+
+    def state_files(self):
+        files = [self.indexed_links_file, self.failed_links_file, self.links_to_index_file]
+        return files + [self.journal_file] if self.journal_file else files
+
+    def path(self, file_path):
+        return os.path.join(self.data_dir, file_path)
+
+    def replay_journal(self):
+        journal_path = self.path(self.journal_file)
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r') as file:
+                for line in file.read().splitlines():
+                    op, _, url = line.partition('\t')
+                    # Оборванная при падении последняя строка не содержит ссылки
+                    if url and self.canonicalize:
+                        url = self.canonicalize(url)
+                    if url:
+                        self.apply(op, url)
+                        self.journal_entries += 1
+            print(f"Replayed {self.journal_entries} journal entries from {journal_path}")
+
+    def apply(self, op, url):
+        if op == JOURNAL_INDEXED:
+            self.indexed.add(url)
+            self.pending.discard(url)
+        elif op == JOURNAL_FAILED:
+            self.failed.add(url)
+            self.pending.discard(url)
+        elif op == JOURNAL_PENDING:
+            self.pending.add(url)
+        elif op == JOURNAL_REINDEX:
+            self.indexed.discard(url)
+
+    def record(self, op, url):
+        self.apply(op, url)
+        if not self.journal_file or self.read_only:
+            return
+        if self.journal is None:
+            self.journal = open(self.path(self.journal_file), 'a')
+        line = f"{op}\t{url}\n"
+        self.journal.write(line)
+        self.journal.flush()
+        self.bytes_written += len(line.encode('utf-8'))
+        self.journal_entries += 1
+
+    def mark_indexed(self, url):
+        self.record(JOURNAL_INDEXED, url)
+
+    def mark_failed(self, url):
+        self.record(JOURNAL_FAILED, url)
+
+    def add_pending(self, url):
+        if url not in self.pending:
+            self.record(JOURNAL_PENDING, url)
+
+    def reindex(self, url):
+        # Проиндексированная ссылка снова ставится в очередь (например, изменился lastmod)
+        self.record(JOURNAL_REINDEX, url)
+        self.add_pending(url)
+
+    def is_processed(self, url):
+        return url in self.indexed or url in self.failed
+
+    def iter_pending(self, leased, is_eligible=None):
+        # Ссылки выдаются из головы очереди и запоминаются в leased до получения результата;
+        # то, что осталось в leased, возвращается в очередь через release().
+        # Ссылки, которым ещё рано на повтор, пропускаются, но тоже возвращаются в очередь.
+        while self.pending:
+            url = self.pending.popleft()
+            if self.is_processed(url):
+                continue
+            leased[url] = None
+            if is_eligible and not is_eligible(url):
+                continue
+            yield url
+
+    def release(self, leased):
+        self.pending.push_front([url for url in leased if not self.is_processed(url)])
+
+    def close(self):
+        if self.journal is not None:
+            os.fsync(self.journal.fileno())
+            self.journal.close()
+            self.journal = None
+
+    def compact(self):
+        self.close()
+        self.bytes_written += self.indexed.write_snapshot(self.path(self.indexed_links_file))
+        self.bytes_written += write_links_atomic(self.path(self.failed_links_file), self.failed)
+        self.bytes_written += write_links_atomic(self.path(self.links_to_index_file), self.pending)
+        if self.journal_file:
+            # Повторное применение журнала к новым снимкам ничего не меняет,
+            # поэтому падение до этой строки безопасно
+            write_links_atomic(self.path(self.journal_file), [])
+        print(f"Compacted {self.journal_entries} journal entries into snapshots")
+        self.journal_entries = 0
+
+    def checkpoint(self, threshold=COMPACT_THRESHOLD):
+        if not self.journal_file or self.journal_entries >= threshold:
+            self.compact()
+        else:
+            self.close()
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from link_store import DATA_DIR
+
+LIVENESS_WORKERS = 8
+LIVENESS_TIMEOUT = (5, 15)
+# Результат проверки живой страницы действует сутки, удалённой - неделю
+LIVENESS_TTL = 24 * 3600
+GONE_TTL = 7 * 24 * 3600
+
+LIVE = 'live'
+GONE = 'gone'
+REDIRECT = 'redirect'
+NOINDEX = 'noindex'
+UNKNOWN = 'unknown'
+
+LivenessResult = namedtuple('LivenessResult', ['state', 'status', 'target'])
+
+
+def is_noindex(robots_header):
+    # X-Robots-Tag: "noindex", "none" или "googlebot: noindex"; директивы для других роботов не учитываем
+    if not robots_header:
+        return False
+    for directive in robots_header.lower().split(','):
+        bot, _, rule = directive.rpartition(':')
+        if bot.strip() not in ('', 'googlebot'):
+            continue
+        if rule.strip() in ('noindex', 'none'):
+            return True
+    return False
+
+
+class LivenessCache:
+    # Результаты проверок на диске: ссылка -> [время проверки, состояние, HTTP-статус, цель редиректа]
+    def __init__(self, cache_file, data_dir=DATA_DIR, ttl=LIVENESS_TTL):
+        self.path = os.path.join(data_dir, cache_file)
+        self.ttl = ttl
+        self.urls = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.urls = json.load(f)
+        print(f"Loaded {len(self.urls)} cached liveness checks")
+        return self
+
+    def save(self):
+        now = time.time()
+        self.urls = {url: entry for url, entry in self.urls.items() if not self.expired(entry, now)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.urls, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def expired(self, entry, now):
+        ttl = GONE_TTL if entry[1] == GONE else self.ttl
+        return entry[0] + ttl <= now
+
+    def get(self, url):
+        entry = self.urls.get(url)
+        if entry is None or self.expired(entry, time.time()):
+            return None
+        return LivenessResult(entry[1], entry[2], entry[3])
+
+    def put(self, url, result):
+        self.urls[url] = [int(time.time()), result.state, result.status, result.target]
+
+
+class LivenessChecker:
+    # Проверка страниц перед отправкой: HEAD-запросы параллельно, не больше workers одновременно.
+    # 404/410 - страница удалена, редирект на другой канонический адрес - отправлять надо цель,
+    # X-Robots-Tag: noindex - страницу не отправляем. Ошибки сервера и сети не кэшируются.
+    def __init__(self, session, cache, canonicalize=None, workers=LIVENESS_WORKERS, timeout=LIVENESS_TIMEOUT):
+        self.session = session
+        self.cache = cache
+        self.canonicalize = canonicalize
+        self.workers = workers
+        self.timeout = timeout
+
+    def fetch(self, url):
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        if response.status_code in (405, 501):
+            # Сервер не поддерживает HEAD: GET без чтения тела
+            response.close()
+            response = self.session.get(url, allow_redirects=True, timeout=self.timeout, stream=True)
+        response.close()
+        return response
+
+    def check(self, url):
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        try:
+            response = self.fetch(url)
+        except requests.RequestException as e:
+            print(f"Liveness check failed for {url}: {e}")
+            return LivenessResult(UNKNOWN, None, None)
+        status = response.status_code
+        if status in (404, 410):
+            result = LivenessResult(GONE, status, None)
+        elif status >= 400:
+            return LivenessResult(UNKNOWN, status, None)
+        elif is_noindex(response.headers.get('X-Robots-Tag')):
+            result = LivenessResult(NOINDEX, status, None)
+        else:
+            target = response.url
+            if self.canonicalize:
+                target = self.canonicalize(target) or target
+            if response.history and target != url:
+                result = LivenessResult(REDIRECT, response.history[0].status_code, target)
+            else:
+                result = LivenessResult(LIVE, status, None)
+        self.cache.put(url, result)
+        return result
+
+    def iter_checked(self, urls):
+        # Проверки идут с опережением, но результаты выдаются в порядке очереди
+        urls = iter(urls)
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                while len(in_flight) < self.workers * 2:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    in_flight.append((url, executor.submit(self.check, url)))
+                if not in_flight:
+                    return
+                url, future = in_flight.popleft()
+                yield url, future.result()
+
+
+def same_site(url, target):
+    return urlsplit(url).hostname == urlsplit(target).hostname
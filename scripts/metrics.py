@@ -0,0 +1,196 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+REPORT_FILE = 'run_report.json'
+# Границы корзин гистограммы задержек запросов к Indexing API, в секундах
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+OUTCOMES = ('2xx', '429', '503', 'other')
+
+
+def outcome(response):
+    if response == 'QUOTA_EXCEEDED':
+        return '429'
+    if response == 'SERVICE_UNAVAILABLE':
+        return '503'
+    return '2xx' if response else 'other'
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # Как в Prometheus: число наблюдений не больше каждой границы
+        total = 0
+        result = []
+        for le, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((le, total))
+        return result
+
+    def as_dict(self):
+        return {
+            'buckets': {('+Inf' if le == float('inf') else str(le)): count for le, count in self.cumulative()},
+            'sum': round(self.sum, 6),
+            'count': self.count,
+        }
+
+
+class SiteMetrics:
+    # Метрики одного сайта за запуск: время этапов, счётчики, значения и гистограммы задержек.
+    # Обновляются из рабочих потоков, поэтому все изменения идут под блокировкой
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.counters = {}
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.values = {}
+        self.histograms = {}
+        self.accounts = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        with self.lock:
+            self.values[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def record_results(self, results):
+        with self.lock:
+            for _, response in results:
+                self.outcomes[outcome(response)] += 1
+
+    def record_account(self, account, budget, published, rate_limited):
+        # Расход квоты по сервисным аккаунтам пула; в режиме службы суммируется по всем циклам
+        with self.lock:
+            usage = self.accounts.setdefault(account, {'budget': 0, 'published': 0, 'rate_limited': False})
+            usage['budget'] += budget
+            usage['published'] += published
+            usage['rate_limited'] = usage['rate_limited'] or rate_limited
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'phases': {name: round(seconds, 3) for name, seconds in self.phases.items()},
+                'outcomes': dict(self.outcomes),
+                'counters': dict(self.counters),
+                'values': dict(self.values),
+                'histograms': {name: histogram.as_dict() for name, histogram in self.histograms.items()},
+                'accounts': {account: dict(usage) for account, usage in self.accounts.items()},
+            }
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.sites = {}
+        self.lock = threading.Lock()
+
+    def site(self, name):
+        with self.lock:
+            metrics = self.sites.get(name)
+            if metrics is None:
+                metrics = self.sites[name] = SiteMetrics(name)
+            return metrics
+
+    def report(self):
+        return {
+            'started_at': datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='seconds'),
+            'duration': round(time.perf_counter() - self.start, 3),
+            'sites': {name: metrics.as_dict() for name, metrics in self.sites.items()},
+        }
+
+    def write_report(self, path):
+        report = self.report()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=1)
+        os.replace(tmp_path, path)
+        print(f"Run report written to {path}")
+        return report
+
+    def prometheus_lines(self):
+        lines = [
+            '# TYPE indexer_run_duration_seconds gauge',
+            f'indexer_run_duration_seconds {time.perf_counter() - self.start:.3f}',
+            '# TYPE indexer_run_started_timestamp_seconds gauge',
+            f'indexer_run_started_timestamp_seconds {self.started:.0f}',
+        ]
+        sites = [(name, metrics.as_dict()) for name, metrics in self.sites.items()]
+        lines.append('# TYPE indexer_phase_seconds gauge')
+        for name, data in sites:
+            for phase, seconds in data['phases'].items():
+                lines.append(f'indexer_phase_seconds{{site="{name}",phase="{phase}"}} {seconds}')
+        lines.append('# TYPE indexer_publish_results_total counter')
+        for name, data in sites:
+            for result, count in data['outcomes'].items():
+                lines.append(f'indexer_publish_results_total{{site="{name}",outcome="{result}"}} {count}')
+        for metric, key, metric_type in (('account_budget', 'budget', 'gauge'),
+                                         ('account_published_total', 'published', 'counter'),
+                                         ('account_rate_limited', 'rate_limited', 'gauge')):
+            lines.append(f'# TYPE indexer_{metric} {metric_type}')
+            for name, data in sites:
+                for account, usage in data['accounts'].items():
+                    lines.append(f'indexer_{metric}{{site="{name}",account="{account}"}} {int(usage[key])}')
+        for kind, metric_type in (('counters', 'counter'), ('values', 'gauge')):
+            # Нечисловые значения (например, причина остановки) есть только в JSON-отчёте
+            metric_names = sorted({metric for _, data in sites for metric, value in data[kind].items()
+                                   if isinstance(value, (int, float))})
+            for metric in metric_names:
+                suffix = '_total' if metric_type == 'counter' else ''
+                lines.append(f'# TYPE indexer_{metric}{suffix} {metric_type}')
+                for name, data in sites:
+                    if metric in data[kind]:
+                        lines.append(f'indexer_{metric}{suffix}{{site="{name}"}} {data[kind][metric]}')
+        for metric in sorted({metric for _, data in sites for metric in data['histograms']}):
+            lines.append(f'# TYPE indexer_{metric} histogram')
+            for name, data in sites:
+                histogram = data['histograms'].get(metric)
+                if not histogram:
+                    continue
+                for le, count in histogram['buckets'].items():
+                    lines.append(f'indexer_{metric}_bucket{{site="{name}",le="{le}"}} {count}')
+                lines.append(f'indexer_{metric}_sum{{site="{name}"}} {histogram["sum"]}')
+                lines.append(f'indexer_{metric}_count{{site="{name}"}} {histogram["count"]}')
+        return lines
+
+    def write_prometheus(self, path):
+        # Текстовый формат Prometheus, например для textfile collector у node_exporter
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(self.prometheus_lines()) + "\n")
+        os.replace(tmp_path, path)
+        print(f"Prometheus metrics written to {path}")
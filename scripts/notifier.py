@@ -0,0 +1,154 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from transport import create_session
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+# Адрес Bot API можно подменить, например на заглушку из benchmarks/
+API_URL_ENV = 'TELEGRAM_API_URL'
+# Сообщения, пришедшие в течение окна, объединяются в одно
+DEFAULT_WINDOW = 2.0
+# Telegram допускает примерно одно сообщение в секунду в один чат
+DEFAULT_MIN_INTERVAL = 1.0
+SEND_TIMEOUT = 10
+SEND_ATTEMPTS = 3
+CLOSE_TIMEOUT = 30
+MAX_MESSAGE_LENGTH = 4096
+
+_STOP = object()
+
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    # Длинная сводка режется по строкам на части, которые Telegram примет
+    chunks = []
+    current = ''
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Notifier:
+    # Отправка сообщений в Telegram в фоновом потоке: notify() только ставит сообщение
+    # в очередь и сразу возвращается, поэтому медленный API Telegram не тормозит индексацию.
+    # Сообщения за окно window склеиваются в одно, между отправками выдерживается min_interval.
+    def __init__(self, token, chat_id, api_url=TELEGRAM_API_URL, window=DEFAULT_WINDOW,
+                 min_interval=DEFAULT_MIN_INTERVAL, timeout=SEND_TIMEOUT):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_url = api_url.rstrip('/')
+        self.window = window
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.messages = queue.Queue()
+        self.session = create_session(1)
+        self.last_sent = 0.0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def notify(self, message):
+        if not self.token:
+            print(f"Telegram token is not set, message dropped: {message}")
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='telegram-notifier', daemon=True)
+                self.thread.start()
+        self.messages.put(message)
+
+    def flush(self, timeout=CLOSE_TIMEOUT):
+        # Ждёт, пока все поставленные в очередь сообщения будут отправлены
+        deadline = time.monotonic() + timeout
+        while self.messages.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self.messages.unfinished_tasks
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        if self.thread is None:
+            return
+        self.messages.put(_STOP)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"Telegram notifier did not finish in {timeout}s, {self.messages.qsize()} messages dropped")
+        self.thread = None
+
+    def _run(self):
+        while True:
+            message = self.messages.get()
+            batch = []
+            stop = message is _STOP
+            if not stop:
+                batch.append(message)
+                deadline = time.monotonic() + self.window
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        message = self.messages.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if message is _STOP:
+                        stop = True
+                        break
+                    batch.append(message)
+            if batch:
+                for chunk in split_message("\n".join(batch)):
+                    self._send(chunk)
+            for _ in range(len(batch) + stop):
+                self.messages.task_done()
+            if stop:
+                return
+
+    def _send(self, text):
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        for attempt in range(SEND_ATTEMPTS):
+            wait = self.last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = self.session.post(url, data={"chat_id": self.chat_id, "text": text}, timeout=self.timeout)
+                self.last_sent = time.monotonic()
+                if response.status_code == 429:
+                    # Telegram сообщает, через сколько секунд можно повторить
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                    print(f"Telegram rate limit, retrying in {retry_after}s")
+                    time.sleep(min(retry_after, CLOSE_TIMEOUT))
+                    continue
+                print(f"Telegram response: {response.status_code} {response.text[:200]}")
+                return response.ok
+            except (requests.RequestException, ValueError) as e:
+                self.last_sent = time.monotonic()
+                print(f"Error sending Telegram message (attempt {attempt + 1}): {e}")
+        return False
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    # Один уведомитель на процесс; неотправленные сообщения досылаются при выходе
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = Notifier(os.getenv('TELEGRAM_TOKEN'), os.getenv('TELEGRAM_CHAT_ID'),
+                                 os.getenv(API_URL_ENV) or TELEGRAM_API_URL)
+            atexit.register(_notifier.close)
+        return _notifier
@@ -0,0 +1,197 @@
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from rate_limiter import TokenBucket, backoff_delay
+from transport import refresh_api_credentials
+
+# Indexing API принимает не больше 100 уведомлений в одном batch-запросе
+MAX_BATCH_SIZE = 100
+# Лимит Indexing API - 600 publish-запросов в минуту на проект
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 100
+DEFAULT_WORKERS = 4
+# Повторы внутри запуска для 503 и временных ошибок: 1, 2, 4 секунды с jitter
+UNAVAILABLE_RETRIES = 3
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+TRANSIENT_STATUSES = (500, 502, 504)
+STOP_RESULTS = ('QUOTA_EXCEEDED', 'SERVICE_UNAVAILABLE')
+
+
+class PublishFailure(namedtuple('PublishFailure', ['status', 'reason', 'transient'])):
+    # Ошибка публикации; как и прежний None, считается ложным значением
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+
+def api_errors():
+    # Исключения клиента Google импортируются при первой отправке, а не при импорте модуля.
+    # Ошибки соединения: requests (подкласс OSError), httplib2 при обновлении токена в batch
+    # и google-auth, если токен не удалось получить из-за сети
+    import httplib2
+    from googleapiclient.errors import HttpError
+    from google.auth.exceptions import RefreshError, TransportError
+
+    return HttpError, RefreshError, (OSError, httplib2.HttpLib2Error, TransportError)
+
+
+def publish_errors():
+    http_error, refresh_error, network_errors = api_errors()
+    return (http_error, refresh_error) + network_errors
+
+
+def classify_error(error, url):
+    HttpError, RefreshError, network_errors = api_errors()
+    if isinstance(error, HttpError):
+        if error.resp.status == 429:
+            print(f"Quota exceeded while indexing {url}")
+            return 'QUOTA_EXCEEDED'
+        elif error.resp.status == 503:
+            print(f"Service unavailable while indexing {url}")
+            return 'SERVICE_UNAVAILABLE'
+        print(f"Error indexing {url}: {error}")
+        status = error.resp.status
+        return PublishFailure(status, getattr(error, 'reason', None) or str(error), status in TRANSIENT_STATUSES)
+    if isinstance(error, RefreshError):
+        print(f"Refresh error while indexing {url}: {error}")
+        return PublishFailure('refresh_error', str(error), True)
+    if isinstance(error, network_errors):
+        print(f"Network error while indexing {url}: {error}")
+        return PublishFailure('network_error', str(error), True)
+    raise error
+
+
+def is_retryable(response):
+    return response == 'SERVICE_UNAVAILABLE' or (isinstance(response, PublishFailure) and response.transient)
+
+
+def publish_request(service, url, notification_type='URL_UPDATED'):
+    body = {
+        "url": url,
+        "type": notification_type
+    }
+    return service.urlNotifications().publish(body=body)
+
+
+def index_url(service, url, http=None, notification_type='URL_UPDATED'):
+    try:
+        response = publish_request(service, url, notification_type).execute(http=http)
+        print(f"Indexed {url}: {response}")
+        return response
+    except publish_errors() as e:
+        return classify_error(e, url)
+
+
+def index_batch(service, urls, http=None, notification_type=None):
+    # Один HTTP-запрос на пачку ссылок; результат по каждой ссылке такой же, как у index_url.
+    # notification_type(url) задаёт тип уведомления для каждой ссылки, по умолчанию URL_UPDATED
+    if len(urls) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(urls)} links exceeds the limit of {MAX_BATCH_SIZE}")
+    results = {}
+
+    def callback(request_id, response, exception):
+        url = urls[int(request_id)]
+        if exception is None:
+            print(f"Indexed {url}: {response}")
+            results[url] = response
+        else:
+            results[url] = classify_error(exception, url)
+
+    batch = service.new_batch_http_request(callback=callback)
+    for i, url in enumerate(urls):
+        batch.add(publish_request(service, url, notification_type(url) if notification_type else 'URL_UPDATED'),
+                  request_id=str(i))
+    try:
+        if http is None:
+            refresh_api_credentials(service)
+        batch.execute(http=http)
+    except publish_errors() as e:
+        # Ошибка всего batch-запроса относится ко всем ссылкам, на которые ещё нет ответа
+        print(f"Batch request for {len(urls)} links failed: {e}")
+        for url in urls:
+            if url not in results:
+                results[url] = classify_error(e, url)
+    return [(url, results.get(url)) for url in urls]
+
+
+def publish_unit(service, urls, bucket, batched, metrics=None, notification_type=None):
+    # 503, 5xx, обновление токена и сетевые ошибки повторяем с экспоненциальной задержкой;
+    # 429 означает исчерпанную квоту и не повторяется
+    results = {}
+    remaining = urls
+    for attempt in range(UNAVAILABLE_RETRIES + 1):
+        bucket.acquire(len(remaining))
+        start = time.perf_counter()
+        if batched:
+            unit_results = index_batch(service, remaining, notification_type=notification_type)
+        else:
+            url = remaining[0]
+            kind = notification_type(url) if notification_type else 'URL_UPDATED'
+            unit_results = [(url, index_url(service, url, notification_type=kind))]
+        if metrics:
+            metrics.observe('publish_request_seconds', time.perf_counter() - start)
+            metrics.record_results(unit_results)
+        retry = []
+        for url, response in unit_results:
+            if is_retryable(response) and attempt < UNAVAILABLE_RETRIES:
+                retry.append(url)
+            else:
+                results[url] = response
+        if any(response == 'QUOTA_EXCEEDED' for response in results.values()):
+            # Недоотправленные ссылки остаются в очереди вместе с остальными
+            for url in retry:
+                results[url] = 'QUOTA_EXCEEDED'
+            bucket.backoff()
+            break
+        if not retry:
+            bucket.recover()
+            break
+        bucket.backoff()
+        time.sleep(backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY))
+        remaining = retry
+    return [(url, results.get(url)) for url in urls]
+
+
+def publish_links(service, candidates, limit, on_result, bucket=None, batch_size=1, workers=1, metrics=None,
+                  notification_type=None):
+    # Параллельная отправка: не больше workers запросов одновременно, частота задаётся bucket.
+    # notification_type(url) - тип уведомления (URL_UPDATED или URL_DELETED), по умолчанию URL_UPDATED.
+    # Ссылки, на которые пришёл 429/503, в on_result не попадают и остаются в очереди.
+    # on_result может вернуть True, чтобы остановить отправку.
+    bucket = bucket or TokenBucket(DEFAULT_RATE, DEFAULT_BURST)
+    candidates = iter(candidates)
+    batched = batch_size > 1
+    published = 0
+    stop_reason = None
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while not stop_reason and len(in_flight) < workers:
+                budget = limit - published - sum(in_flight.values())
+                urls = list(islice(candidates, min(batch_size, budget))) if budget > 0 else []
+                if not urls:
+                    break
+                if batched:
+                    print(f"Indexing batch of {len(urls)} URLs")
+                else:
+                    print(f"Indexing URL: {urls[0]}")
+                in_flight[executor.submit(publish_unit, service, urls, bucket, batched, metrics,
+                                          notification_type)] = len(urls)
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                del in_flight[future]
+                for url, response in future.result():
+                    if response in STOP_RESULTS:
+                        stop_reason = stop_reason or response
+                        continue
+                    if response:
+                        published += 1
+                    if on_result(url, response):
+                        stop_reason = stop_reason or 'STOPPED'
+    return stop_reason
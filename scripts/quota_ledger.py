@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from link_store import DATA_DIR
+
+LEDGER_FILE = 'quota_ledger.json'
+# Квота Indexing API по умолчанию - 200 publish-запросов в сутки
+DEFAULT_DAILY_QUOTA = 200
+KEEP_DAYS = 7
+
+
+def utc_today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class QuotaLedger:
+    # Локальный учёт дневной квоты по сервисным аккаунтам: сколько отправлено и были ли 429 за сутки (UTC).
+    # Сайты с общим аккаунтом резервируют бюджет через reserve(), чтобы параллельные запуски не превысили квоту.
+    def __init__(self, ledger_file=LEDGER_FILE, data_dir=DATA_DIR):
+        self.path = os.path.join(data_dir, ledger_file)
+        self.accounts = {}
+        self.reserved = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.accounts = json.load(f)
+        return self
+
+    def save(self):
+        with self.lock:
+            oldest = (datetime.now(timezone.utc).date() - timedelta(days=KEEP_DAYS)).isoformat()
+            for days in self.accounts.values():
+                for day in [day for day in days if day < oldest]:
+                    del days[day]
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.accounts, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def has_data(self, account):
+        return bool(self.accounts.get(account))
+
+    def usage(self, account, day=None):
+        return self.accounts.get(account, {}).get(day or utc_today(), {'published': 0, 'rate_limited': 0})
+
+    def _today(self, account):
+        return self.accounts.setdefault(account, {}).setdefault(utc_today(), {'published': 0, 'rate_limited': 0})
+
+    def record_published(self, account, count=1):
+        with self.lock:
+            self._today(account)['published'] += count
+
+    def record_rate_limited(self, account):
+        with self.lock:
+            self._today(account)['rate_limited'] += 1
+
+    def _remaining(self, account, daily_quota):
+        # Вызывается под self.lock
+        usage = self.usage(account)
+        # После 429 квота считается исчерпанной до конца суток
+        if usage['rate_limited']:
+            return 0
+        return max(0, daily_quota - usage['published'] - self.reserved.get(account, 0))
+
+    def remaining(self, account, daily_quota=DEFAULT_DAILY_QUOTA):
+        with self.lock:
+            return self._remaining(account, daily_quota)
+
+    def reserve(self, account, daily_quota=DEFAULT_DAILY_QUOTA, limit=None):
+        # Остаток считается и резервируется под одной блокировкой,
+        # иначе два потока с общим аккаунтом могут получить один и тот же остаток
+        with self.lock:
+            remaining = self._remaining(account, daily_quota)
+            granted = remaining if limit is None else min(limit, remaining)
+            self.reserved[account] = self.reserved.get(account, 0) + granted
+        return granted
+
+    def release(self, account, granted):
+        with self.lock:
+            self.reserved[account] = max(0, self.reserved.get(account, 0) - granted)
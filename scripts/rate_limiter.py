@@ -0,0 +1,56 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    # Ограничение частоты запросов: rate токенов в секунду, не больше burst в запасе.
+    # При 429/503 скорость снижается вдвое, после успешных запросов плавно восстанавливается.
+    def __init__(self, rate, burst=1, min_rate=None):
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        # Запрос больше burst (например, batch на 100 ссылок) уводит баланс в минус,
+        # и следующие запросы ждут, пока долг не восстановится
+        needed = min(tokens, self.burst)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self):
+        with self.lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            print(f"Rate limited, slowing down to {self.rate:.2f} requests/s")
+
+    def recover(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+def backoff_delay(attempt, base, cap):
+    # Экспоненциальная задержка с jitter: половина фиксирована, половина случайна,
+    # чтобы повторы разных запросов не совпадали по времени
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,65 @@
+import json
+import os
+import time
+
+from link_store import DATA_DIR
+from rate_limiter import backoff_delay
+
+DEFAULT_MAX_ATTEMPTS = 5
+# Повтор в следующих запусках: через ~1 час, 2, 4... но не позже чем через неделю
+RETRY_BASE_DELAY = 3600
+RETRY_MAX_DELAY = 7 * 24 * 3600
+
+
+class RetryState:
+    # Состояние повторов по каждой ссылке: число попыток, последний статус и время,
+    # раньше которого ссылку не отправляем. После max_attempts ссылка уходит в dead-letter
+    # (failed_links_*.txt) и больше не отправляется.
+    def __init__(self, retry_file, data_dir=DATA_DIR, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = os.path.join(data_dir, retry_file)
+        self.max_attempts = max_attempts
+        self.urls = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.urls = json.load(f)
+        print(f"Loaded retry state for {len(self.urls)} links")
+        return self
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.urls, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def attempts(self, url):
+        return self.urls.get(url, {}).get('attempts', 0)
+
+    def is_eligible(self, url, now=None):
+        state = self.urls.get(url)
+        return state is None or state['next_eligible'] <= (now or time.time())
+
+    def record_failure(self, url, status):
+        # Возвращает True, если попытки исчерпаны и ссылку пора перенести в dead-letter
+        attempts = self.attempts(url) + 1
+        if attempts >= self.max_attempts:
+            self.urls.pop(url, None)
+            return True
+        self.urls[url] = {
+            'attempts': attempts,
+            'last_status': status,
+            'next_eligible': int(time.time() + backoff_delay(attempts - 1, RETRY_BASE_DELAY, RETRY_MAX_DELAY)),
+        }
+        return False
+
+    def defer(self, url, status, delay):
+        # Отложить ссылку без траты попытки: она остаётся в очереди и не уходит в dead-letter
+        self.urls[url] = {
+            'attempts': self.attempts(url),
+            'last_status': status,
+            'next_eligible': int(time.time() + delay),
+        }
+
+    def clear(self, url):
+        self.urls.pop(url, None)
@@ -0,0 +1,103 @@
+import heapq
+from datetime import datetime, timezone
+from itertools import count
+from urllib.parse import urlsplit
+
+DEFAULT_SITEMAP_PRIORITY = 0.5
+
+
+def parse_lastmod(lastmod):
+    # W3C Datetime из sitemap: 2024-01-31, 2024-01-31T10:00:00+06:00 или с суффиксом Z
+    if not lastmod:
+        return 0.0
+    try:
+        parsed = datetime.fromisoformat(lastmod.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_priority(priority):
+    try:
+        return float(priority)
+    except (TypeError, ValueError):
+        return DEFAULT_SITEMAP_PRIORITY
+
+
+def url_depth(url):
+    return len([part for part in urlsplit(url).path.split('/') if part])
+
+
+def make_priority(sitemap_state=None, retry_count=None):
+    # Ключ для кучи: меньше - раньше. Сначала ссылки без неудачных попыток, затем ни разу
+    # не отправлявшиеся, затем более свежий lastmod, более высокий priority из sitemap,
+    # и при прочих равных страницы товаров (глубже в каталоге) раньше категорий
+    def priority(url):
+        lastmod, published, sitemap_priority = sitemap_state.get(url) if sitemap_state else (None, None, None)
+        retries = retry_count(url) if retry_count else 0
+        return (
+            retries,
+            published is not None,
+            -parse_lastmod(lastmod),
+            -parse_priority(sitemap_priority),
+            -url_depth(url),
+        )
+    return priority
+
+
+class PriorityLinkQueue:
+    # Очередь на отправку с приоритетами: куча с ленивым удалением.
+    # Следующая ссылка берётся за O(log n), удаление и проверка наличия - за O(1).
+    def __init__(self, links=(), key=None):
+        self.key = key or make_priority()
+        self._order = count()
+        self._entries = {}
+        for url in links:
+            if url not in self._entries:
+                self._entries[url] = [self.key(url), next(self._order), url]
+        self._heap = list(self._entries.values())
+        heapq.heapify(self._heap)
+
+    def __contains__(self, url):
+        return url in self._entries
+
+    def __iter__(self):
+        # Порядок добавления, чтобы снимок очереди на диске менялся минимально
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, url):
+        if url not in self._entries:
+            entry = [self.key(url), next(self._order), url]
+            self._entries[url] = entry
+            heapq.heappush(self._heap, entry)
+
+    def discard(self, url):
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            entry[-1] = None
+
+    def reprioritize(self, url):
+        if url in self._entries:
+            self.discard(url)
+            self.add(url)
+
+    def popleft(self):
+        while self._heap:
+            url = heapq.heappop(self._heap)[-1]
+            if url is not None:
+                del self._entries[url]
+                return url
+        raise KeyError('pop from an empty queue')
+
+    def push_front(self, urls):
+        # Возвращённые ссылки снова встают на своё место по приоритету
+        for url in urls:
+            self.add(url)
+
+    def ordered(self):
+        return [entry[-1] for entry in sorted(self._entries.values())]
@@ -0,0 +1,256 @@
+import gzip
+import io
+import json
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import iterparse
+
+from link_store import COMPACT_THRESHOLD, DATA_DIR, write_links_atomic
+from transport import create_session
+from urls import UrlHashSet
+
+SITEMAP_WORKERS = 8
+SITEMAP_TIMEOUT = 30
+GZIP_MAGIC = b'\x1f\x8b'
+
+SitemapEntry = namedtuple('SitemapEntry', ['loc', 'lastmod', 'priority'])
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def open_sitemap_stream(response):
+    # Content-Encoding снимает urllib3, а .xml.gz приходит как есть - распознаём по сигнатуре gzip
+    response.raw.decode_content = True
+    response.raw.auto_close = False
+    stream = io.BufferedReader(response.raw)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def parse_sitemap(stream):
+    # Разбор по мере чтения: обработанные элементы сразу удаляются из дерева.
+    # Поля берутся только у прямых потомков <url>/<sitemap>: вложенные расширения
+    # вроде <image:image><image:loc> не подменяют адрес страницы
+    child_sitemaps = []
+    entries = []
+    fields = {}
+    root = None
+    depth = 0
+    for event, elem in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        name = local_name(elem.tag)
+        if depth == 2 and name in ('loc', 'lastmod', 'priority'):
+            fields[name] = (elem.text or '').strip() or None
+        elif depth == 1 and name == 'url':
+            if fields.get('loc'):
+                entries.append(SitemapEntry(fields['loc'], fields.get('lastmod'), fields.get('priority')))
+            fields = {}
+            root.clear()
+        elif depth == 1 and name == 'sitemap':
+            if fields.get('loc'):
+                child_sitemaps.append(fields['loc'])
+            fields = {}
+            root.clear()
+    return child_sitemaps, entries
+
+
+class SitemapState:
+    # Валидаторы HTTP-кэша для каждого sitemap и lastmod каждой ссылки:
+    # какой lastmod был в sitemap, с каким lastmod ссылка была отправлена последний раз
+    # и её priority из sitemap.
+    # Изменения lastmod дописываются в журнал, а файл lastmod переписывается целиком
+    # только при сворачивании журнала - как в LinkStore
+    def __init__(self, cache_file, lastmod_file, data_dir=DATA_DIR, journal_file=None):
+        self.cache_path = os.path.join(data_dir, cache_file)
+        self.lastmod_path = os.path.join(data_dir, lastmod_file)
+        self.journal_path = os.path.join(data_dir, journal_file) if journal_file else None
+        self.sitemaps = {}
+        self.lastmods = {}
+        # Ссылки, у которых lastmod изменился после последнего сохранения
+        self.changed = set()
+        self.journal_entries = 0
+
+    def load(self):
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, 'r') as file:
+                self.sitemaps = json.load(file)
+        if os.path.exists(self.lastmod_path):
+            self.read_lastmods(self.lastmod_path)
+        if self.journal_path and os.path.exists(self.journal_path):
+            self.journal_entries = self.read_lastmods(self.journal_path, journal=True)
+        print(f"Loaded {len(self.sitemaps)} cached sitemaps and {len(self.lastmods)} lastmods")
+        return self
+
+    def read_lastmods(self, path, journal=False):
+        count = 0
+        with open(path, 'r') as file:
+            for line in file.read().splitlines():
+                fields = line.split('\t')
+                # Оборванная при падении последняя строка журнала короче четырёх полей
+                if journal and len(fields) < 4:
+                    continue
+                url, seen, published, priority = (fields + ['', '', ''])[:4]
+                self.lastmods[url] = [seen or None, published or None, priority or None]
+                count += 1
+        return count
+
+    def format_lastmod(self, url):
+        seen, published, priority = self.lastmods[url]
+        return f"{url}\t{seen or ''}\t{published or ''}\t{priority or ''}"
+
+    def save(self, threshold=COMPACT_THRESHOLD):
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(self.sitemaps, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+        if not self.changed:
+            return
+        if self.journal_path and self.journal_entries + len(self.changed) < threshold:
+            with open(self.journal_path, 'a+b') as file:
+                # Оборванную последнюю строку закрываем, чтобы новая запись не склеилась с ней
+                if file.tell():
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b'\n':
+                        file.write(b'\n')
+                file.writelines(f"{self.format_lastmod(url)}\n".encode('utf-8') for url in self.changed)
+                file.flush()
+                os.fsync(file.fileno())
+            self.journal_entries += len(self.changed)
+            print(f"Appended {len(self.changed)} lastmod changes to {self.journal_path}")
+        else:
+            write_links_atomic(self.lastmod_path, (self.format_lastmod(url) for url in self.lastmods))
+            if self.journal_path:
+                write_links_atomic(self.journal_path, [])
+            self.journal_entries = 0
+            print(f"Saved {len(self.lastmods)} lastmods to {self.lastmod_path}")
+        self.changed = set()
+
+    def conditional_headers(self, sitemap_url):
+        cached = self.sitemaps.get(sitemap_url, {})
+        headers = {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def remember_sitemap(self, sitemap_url, response, child_sitemaps):
+        self.sitemaps[sitemap_url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'children': child_sitemaps,
+        }
+
+    def get(self, url):
+        return self.lastmods.get(url, (None, None, None))
+
+    def update_lastmod(self, url, lastmod, priority=None):
+        # Возвращает True, если ссылку надо отправить заново: lastmod изменился после публикации
+        seen, published, old_priority = self.get(url)
+        if seen != lastmod or old_priority != priority:
+            self.lastmods[url] = [lastmod, published, priority]
+            self.changed.add(url)
+        return published is not None and lastmod is not None and lastmod != published
+
+    def mark_published(self, url):
+        seen, published, priority = self.get(url)
+        if seen != published:
+            self.lastmods[url] = [seen, seen, priority]
+            self.changed.add(url)
+
+
+def fetch_sitemap(session, sitemap_url, state=None, metrics=None):
+    print(f"Fetching sitemap links from {sitemap_url}")
+    headers = state.conditional_headers(sitemap_url) if state else {}
+    try:
+        with session.get(sitemap_url, headers=headers, stream=True, timeout=SITEMAP_TIMEOUT) as response:
+            if response.status_code == 304:
+                # sitemap не изменился: ссылки из него пропускаем, но вложенные sitemap проверяем дальше
+                child_sitemaps = state.sitemaps[sitemap_url].get('children', [])
+                print(f"Sitemap {sitemap_url} not modified")
+                if metrics:
+                    metrics.count('sitemaps_not_modified')
+                return child_sitemaps, []
+            if response.status_code != 200:
+                print(f"Failed to fetch sitemap from {sitemap_url}, status code: {response.status_code}")
+                return [], []
+            child_sitemaps, entries = parse_sitemap(open_sitemap_stream(response))
+            if metrics:
+                # Байты, полученные по сети, до распаковки
+                metrics.count('sitemap_bytes_read', response.raw.tell())
+                metrics.count('sitemaps_fetched')
+            if state:
+                state.remember_sitemap(sitemap_url, response, child_sitemaps)
+        print(f"Fetched {len(entries)} links and {len(child_sitemaps)} sitemaps from {sitemap_url}")
+        return child_sitemaps, entries
+    except Exception as e:
+        print(f"Error fetching sitemap from {sitemap_url}: {e}")
+    return [], []
+
+
+def iter_sitemap_entries(sitemap_url, session=None, workers=SITEMAP_WORKERS, state=None, canonicalize=None,
+                         metrics=None):
+    # Дочерние sitemap скачиваются параллельно, но выдаются в порядке обнаружения,
+    # а в памяти одновременно держится не больше workers документов.
+    # Ссылки приводятся к каноническому виду, и каждая выдаётся один раз
+    session = session or create_session(workers)
+    seen_sitemaps = {sitemap_url}
+    seen_links = UrlHashSet()
+    waiting = deque([sitemap_url])
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while waiting or in_flight:
+            while waiting and len(in_flight) < workers:
+                in_flight.append(executor.submit(fetch_sitemap, session, waiting.popleft(), state, metrics))
+            child_sitemaps, entries = in_flight.popleft().result()
+            for child_url in child_sitemaps:
+                if child_url not in seen_sitemaps:
+                    seen_sitemaps.add(child_url)
+                    waiting.append(child_url)
+            for entry in entries:
+                if canonicalize:
+                    url = canonicalize(entry.loc)
+                    if url is None:
+                        continue
+                    entry = entry._replace(loc=url)
+                if entry.loc not in seen_links:
+                    seen_links.add(entry.loc)
+                    yield entry
+
+
+def iter_sitemap_links(sitemap_url, session=None, workers=SITEMAP_WORKERS, canonicalize=None, metrics=None):
+    for entry in iter_sitemap_entries(sitemap_url, session, workers, canonicalize=canonicalize, metrics=metrics):
+        yield entry.loc
+
+
+def refresh_links(sitemap_url, state, store, session=None, canonicalize=None, metrics=None):
+    # Инкрементальное обновление: в очередь попадают только новые ссылки
+    # и проиндексированные ссылки, у которых lastmod изменился после публикации
+    new_links = 0
+    updated_links = 0
+    for entry in iter_sitemap_entries(sitemap_url, session, state=state, canonicalize=canonicalize, metrics=metrics):
+        url = entry.loc
+        resubmit = state.update_lastmod(url, entry.lastmod, entry.priority)
+        if url in store.failed:
+            continue
+        if url in store.indexed:
+            if not resubmit:
+                # Ссылки, отправленные до появления lastmod-истории, считаем актуальными
+                state.mark_published(url)
+                continue
+            store.reindex(url)
+            updated_links += 1
+        elif url not in store.pending:
+            store.add_pending(url)
+            new_links += 1
+    print(f"Sitemap refresh for {sitemap_url}: {new_links} new links, {updated_links} updated links")
+    return new_links, updated_links
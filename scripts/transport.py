@@ -0,0 +1,106 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Общий HTTP-транспорт: пул keep-alive соединений, таймауты на каждый запрос и повторы
+# на уровне соединения. requests не поддерживает HTTP/2, поэтому экономим за счёт
+# повторного использования соединений; сжатие (gzip) requests запрашивает сам.
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+POOL_SIZE = 8
+
+# GET (sitemap, discovery) можно повторять и при обрыве чтения, и при 5xx
+GET_RETRY = Retry(total=3, connect=3, read=2, status=2, backoff_factor=0.5,
+                  status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset({'GET', 'HEAD'}),
+                  raise_on_status=False, respect_retry_after_header=False)
+# publish - не идемпотентный POST: повторяем только неудавшееся соединение, остальное решает publisher
+API_RETRY = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5, allowed_methods=None)
+
+# Заголовки, которые requests уже обработал: тело приходит распакованным и целиком
+CONSUMED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+def mount_pool(session, pool_size=POOL_SIZE, retries=GET_RETRY):
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class TimeoutSession(requests.Session):
+    # Сессия, в которой у каждого запроса есть таймаут, даже если вызывающий его не указал
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(pool_size=POOL_SIZE, timeout=DEFAULT_TIMEOUT, retries=GET_RETRY):
+    return mount_pool(TimeoutSession(timeout), pool_size, retries)
+
+
+class SessionHttp:
+    # Замена httplib2.Http для googleapiclient поверх AuthorizedSession: один потокобезопасный
+    # пул соединений на учётные данные вместо отдельного httplib2.Http в каждом потоке.
+    # Токен добавляет и обновляет AuthorizedSession, в том числе после ответа 401.
+    # Запросы токена идут через отдельную сессию с таймаутом: через саму AuthorizedSession
+    # обновление зациклилось бы
+    def __init__(self, credentials, pool_size=POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        # google-auth нужен только для запросов к API, поэтому импортируется здесь
+        from google.auth.transport.requests import AuthorizedSession, Request
+
+        # googleapiclient берёт отсюда учётные данные для batch-запросов
+        self.credentials = credentials
+        self.timeout = timeout
+        self.auth_request = Request(create_session(1, timeout))
+        self.refresh_lock = threading.Lock()
+        self.session = mount_pool(AuthorizedSession(credentials, auth_request=self.auth_request), pool_size,
+                                  API_RETRY)
+
+    def refresh_credentials(self):
+        # BatchHttpRequest.execute обновляет просроченный токен через голый httplib2.Http() без таймаута,
+        # поэтому перед batch-запросом токен обновляется здесь - один раз на все потоки
+        with self.refresh_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(self.auth_request)
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=None, connection_type=None):
+        import httplib2
+
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+        info = {key.lower(): value for key, value in response.headers.items() if key.lower() not in CONSUMED_HEADERS}
+        info['status'] = str(response.status_code)
+        result = httplib2.Response(info)
+        result.reason = response.reason
+        return result, response.content
+
+    def close(self):
+        self.session.close()
+
+
+def refresh_api_credentials(service):
+    # Для клиента, собранного поверх SessionHttp (google_client.get_service)
+    http = getattr(service, '_http', None)
+    if isinstance(http, SessionHttp):
+        http.refresh_credentials()
+
+
+_lock = threading.Lock()
+_api_transports = {}
+
+
+def get_api_http(credentials, pool_size=POOL_SIZE):
+    # Сайты с общими учётными данными пользуются одним пулом соединений
+    with _lock:
+        http = _api_transports.get(id(credentials))
+        if http is None:
+            http = _api_transports[id(credentials)] = SessionHttp(credentials, pool_size)
+        return http
@@ -0,0 +1,140 @@
+import bisect
+import hashlib
+from array import array
+from fnmatch import fnmatchcase
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+# Правила по умолчанию: убираем только метки рекламных кампаний, остальные параметры значимы
+DEFAULT_URL_RULES = {
+    # Параметры, которые удаляются (шаблоны fnmatch)
+    'drop_params': ['utm_*', 'gclid', 'fbclid', 'yclid', '_openstat'],
+    # Если задан список, остаются только эти параметры
+    'keep_params': None,
+    # Параметры с фиксированным значением, например {"sl": "ru"}: языковые варианты страницы
+    # сводятся к одному адресу, а ссылки без параметра его получают
+    'force_params': {},
+    # 'add' - путь всегда заканчивается на /, 'remove' - без /, None - как в исходной ссылке
+    'trailing_slash': None,
+}
+
+
+def make_canonicalizer(rules=None):
+    rules = {**DEFAULT_URL_RULES, **(rules or {})}
+    drop_params = rules['drop_params'] or []
+    keep_params = rules['keep_params']
+    force_params = rules['force_params'] or {}
+    trailing_slash = rules['trailing_slash']
+
+    def is_kept(name):
+        if name in force_params:
+            return True
+        if keep_params is not None and not any(fnmatchcase(name, pattern) for pattern in keep_params):
+            return False
+        return not any(fnmatchcase(name, pattern) for pattern in drop_params)
+
+    def canonicalize(url):
+        # Возвращает каноническую ссылку или None, если это не http(s)-адрес.
+        # Порядок оставшихся параметров сохраняется, чтобы уже сохранённые ссылки не менялись
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+        host = parts.hostname
+        if port and port != DEFAULT_PORTS[scheme]:
+            host = f"{host}:{port}"
+
+        path = parts.path or '/'
+        last_segment = path.rsplit('/', 1)[-1]
+        # Файлы вроде index.php не трогаем
+        if trailing_slash == 'add' and last_segment and '.' not in last_segment:
+            path += '/'
+        elif trailing_slash == 'remove' and path != '/':
+            path = path.rstrip('/') or '/'
+
+        params = []
+        forced = dict(force_params)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True):
+            if not is_kept(name):
+                continue
+            if name in forced:
+                value = forced.pop(name)
+            elif name in force_params:
+                continue
+            params.append((name, value))
+        params.extend(forced.items())
+        return urlunsplit((scheme, host, path, urlencode(params, safe='/:,'), ''))
+
+    return canonicalize
+
+
+def url_hash(url):
+    # 64-битный хэш ссылки; вероятность совпадения для 1 млн ссылок - порядка 1e-8
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class UrlHashSet:
+    # Компактное множество ссылок: 8 байт на ссылку вместо ~150 байт строки в set.
+    # Основная часть хранится отсортированным массивом (поиск двоичный), новые хэши
+    # копятся в небольшом set и вливаются в массив пачками, удаления - через надгробия.
+    # Пачка растёт вместе с массивом (не меньше 1/MERGE_RATIO его размера), поэтому
+    # массовое добавление остаётся O(n log n), а не квадратичным
+    MERGE_THRESHOLD = 4096
+    MERGE_RATIO = 8
+
+    def __init__(self, urls=()):
+        self._sorted = array('Q', sorted({url_hash(url) for url in urls}))
+        self._recent = set()
+        self._removed = set()
+
+    def _in_sorted(self, value):
+        i = bisect.bisect_left(self._sorted, value)
+        return i < len(self._sorted) and self._sorted[i] == value
+
+    def contains_hash(self, value):
+        if value in self._recent:
+            return True
+        return value not in self._removed and self._in_sorted(value)
+
+    def __contains__(self, url):
+        return self.contains_hash(url_hash(url))
+
+    def __len__(self):
+        return len(self._sorted) - len(self._removed) + len(self._recent)
+
+    def add_hash(self, value):
+        if value in self._removed:
+            self._removed.discard(value)
+        elif not self._in_sorted(value):
+            self._recent.add(value)
+            if len(self._recent) >= max(self.MERGE_THRESHOLD, len(self._sorted) // self.MERGE_RATIO):
+                self._merge()
+
+    def add(self, url):
+        self.add_hash(url_hash(url))
+
+    def discard_hash(self, value):
+        if value in self._recent:
+            self._recent.discard(value)
+        elif self._in_sorted(value):
+            self._removed.add(value)
+
+    def discard(self, url):
+        self.discard_hash(url_hash(url))
+
+    def _merge(self):
+        # Массив и отсортированная пачка - две готовые серии, sort() сливает их за линейное время
+        removed = self._removed
+        merged = [value for value in self._sorted if value not in removed] if removed else self._sorted.tolist()
+        merged.extend(sorted(self._recent))
+        merged.sort()
+        self._sorted = array('Q', merged)
+        self._recent = set()
+        self._removed = set()
+
+    def memory_size(self):
+        return self._sorted.itemsize * len(self._sorted)
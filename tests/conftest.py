@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Модули scripts/ и стенд из benchmarks/ импортируются напрямую, как в самих скриптах
+sys.path[:0] = [os.path.join(ROOT, 'scripts'), os.path.join(ROOT, 'benchmarks')]
+
+from fake_services import TOKEN_PATH, FakeServices, make_service_account  # noqa: E402
+from helpers import CREDENTIALS_ENV, SHARED_ACCOUNT  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    # Один стенд на все тесты: адрес API попадает в кэш discovery-документа google_client
+    services = FakeServices(sitemap_dir=str(tmp_path_factory.mktemp('sitemaps'))).start()
+    os.environ['INDEXING_API_ENDPOINT'] = services.url
+    os.environ[CREDENTIALS_ENV] = make_service_account(services.url + TOKEN_PATH, SHARED_ACCOUNT)
+    yield services
+    services.stop()
+
+
+@pytest.fixture
+def fake_api(api):
+    api.reset()
+    api.faults.quota = None
+    yield api
+    api.faults.quota = None
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    # Файлы состояния пишутся в data/ относительно рабочего каталога
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
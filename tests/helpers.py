@@ -0,0 +1,25 @@
+import json
+import os
+
+from sitemap_generator import NS
+
+CREDENTIALS_ENV = 'TEST_CREDENTIALS'
+SHARED_ACCOUNT = 'shared@fake-project.iam.gserviceaccount.com'
+
+
+def write_sitemap(services, name, urls):
+    entries = ''.join(f'<url><loc>{url}</loc></url>' for url in urls)
+    with open(os.path.join(services.sitemap_dir, name), 'w') as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{NS}">{entries}</urlset>')
+    return services.sitemap_url(name)
+
+
+def write_config(path, sites, **defaults):
+    config = {
+        'defaults': {'rate': 1e6, 'burst': 1000, **defaults},
+        'sites': [{'credentials_env': CREDENTIALS_ENV, 'data_suffix': site['name'].split('.')[0], **site}
+                  for site in sites],
+    }
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    return str(path)
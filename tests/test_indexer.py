@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers import SHARED_ACCOUNT, write_config, write_sitemap
+from indexer import load_site_state, load_sites, process_site
+from quota_ledger import QuotaLedger
+
+
+class RecordingLedger(QuotaLedger):
+    def __init__(self):
+        super().__init__()
+        self.reservations = []
+
+    def reserve(self, account, daily_quota=None, limit=None):
+        granted = super().reserve(account, daily_quota, limit)
+        self.reservations.append((account, granted))
+        return granted
+
+
+def test_sites_sharing_an_account_reserve_only_what_they_can_publish(fake_api, run_dir):
+    busy_urls = [f'https://busy.local/p/{i}/' for i in range(50)]
+    config = write_config(run_dir / 'sites.json', [
+        {'name': 'empty.local', 'sitemap_url': write_sitemap(fake_api, 'empty.xml', [])},
+        {'name': 'busy.local', 'sitemap_url': write_sitemap(fake_api, 'busy.xml', busy_urls)},
+    ], daily_quota=100)
+    sites = load_sites(config)
+    ledger = RecordingLedger().load()
+
+    with ThreadPoolExecutor(max_workers=len(sites)) as executor:
+        results = list(executor.map(lambda site: process_site(site, ledger), sites))
+
+    assert results == [(0, 0), (50, 50)]
+    assert ledger.reservations == [(SHARED_ACCOUNT, 50)]
+    assert sorted(fake_api.published) == sorted(busy_urls)
+    assert ledger.remaining(SHARED_ACCOUNT, 100) == 50
+
+
+def test_quota_exceeded_mid_batch_returns_unanswered_links_to_queue_head(fake_api, run_dir):
+    urls = [f'https://busy.local/p/{i}/' for i in range(150)]
+    config = write_config(run_dir / 'sites.json', [
+        {'name': 'busy.local', 'sitemap_url': write_sitemap(fake_api, 'busy.xml', urls)},
+    ], daily_quota=100, priority=False)
+    site = load_sites(config)[0]
+    ledger = QuotaLedger().load()
+    # Fake API отвечает 429 на всё после 30 успешных publish
+    fake_api.faults.quota = 30
+
+    assert process_site(site, ledger) == (30, 100)
+
+    _, retry_state, store, _ = load_site_state(site)
+    assert fake_api.published == urls[:30]
+    assert all(url in store.indexed for url in urls[:30])
+    assert list(store.pending) == urls[30:]
+    assert retry_state.urls == {}
+    assert ledger.usage(SHARED_ACCOUNT) == {'published': 30, 'rate_limited': 1}
+    assert ledger.remaining(SHARED_ACCOUNT, 100) == 0
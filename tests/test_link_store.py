@@ -0,0 +1,60 @@
+import shutil
+
+from link_store import LinkStore
+
+URLS = [f'https://a.kz/p/{i}/' for i in range(10)]
+
+
+def load_store(data_dir):
+    return LinkStore('indexed.txt', 'failed.txt', 'pending.txt', 'journal.log', data_dir=str(data_dir)).load()
+
+
+def snapshot(store):
+    return sorted(url for url in URLS if url in store.indexed), sorted(store.failed), list(store.pending)
+
+
+def test_journal_replay_after_crash_between_writes(tmp_path):
+    store = load_store(tmp_path)
+    for url in URLS:
+        store.add_pending(url)
+    store.mark_indexed(URLS[0])
+    store.mark_failed(URLS[1])
+    store.mark_indexed(URLS[2])
+    store.journal.close()
+    # Процесс убит посреди записи следующей строки журнала
+    with open(tmp_path / 'journal.log', 'a') as journal:
+        journal.write('I\t')
+
+    restored = load_store(tmp_path)
+
+    assert snapshot(restored) == ([URLS[0], URLS[2]], [URLS[1]], URLS[3:])
+    assert restored.journal_entries == 13
+
+
+def test_replaying_journal_over_compacted_snapshots_changes_nothing(tmp_path):
+    store = load_store(tmp_path)
+    for url in URLS:
+        store.add_pending(url)
+    store.mark_indexed(URLS[0])
+    store.mark_failed(URLS[1])
+    store.close()
+    shutil.copy(tmp_path / 'journal.log', tmp_path / 'journal.bak')
+    store.compact()
+    expected = snapshot(load_store(tmp_path))
+    # Падение после записи снимков, но до очистки журнала
+    shutil.copy(tmp_path / 'journal.bak', tmp_path / 'journal.log')
+
+    assert snapshot(load_store(tmp_path)) == expected == ([URLS[0]], [URLS[1]], URLS[2:])
+
+
+def test_release_returns_leased_links_to_queue_head(tmp_path):
+    store = load_store(tmp_path)
+    for url in URLS:
+        store.add_pending(url)
+    leased = {}
+    pending = store.iter_pending(leased)
+    taken = [next(pending) for _ in range(4)]
+    store.mark_indexed(taken[1])
+    store.release(leased)
+
+    assert list(store.pending) == [taken[0], taken[2], taken[3]] + URLS[4:]
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from fake_services import FakeServices, Faults
+from notifier import Notifier
+
+
+@pytest.fixture
+def telegram(request):
+    faults = getattr(request, 'param', None)
+    with FakeServices(faults) as services:
+        yield services
+
+
+def make_notifier(services, window=0.2, min_interval=0.0):
+    return Notifier('fake-telegram-token', '1', services.url, window=window, min_interval=min_interval, timeout=5)
+
+
+def test_messages_within_window_are_coalesced(telegram):
+    notifier = make_notifier(telegram, window=0.5)
+    for message in ('first', 'second', 'third'):
+        notifier.notify(message)
+    assert notifier.flush(5)
+    notifier.notify('after window')
+    notifier.close(5)
+    assert telegram.messages == ['first\nsecond\nthird', 'after window']
+
+
+@pytest.mark.parametrize('telegram', [Faults(telegram_429=1, telegram_retry_after=1)], indirect=True)
+def test_rate_limited_message_is_retried_after_retry_after(telegram):
+    notifier = make_notifier(telegram, window=0.0)
+    start = time.monotonic()
+    notifier.notify('limited')
+    notifier.close(10)
+    assert telegram.stats['telegram_429'] == 1
+    assert telegram.messages == ['limited']
+    assert time.monotonic() - start >= 1
+
+
+def test_close_sends_pending_messages_without_waiting_for_window(telegram):
+    notifier = make_notifier(telegram, window=30)
+    start = time.monotonic()
+    notifier.notify('one')
+    notifier.notify('two')
+    notifier.close(10)
+    assert telegram.messages == ['one\ntwo']
+    assert time.monotonic() - start < 5
+    assert notifier.thread is None
+
+
+def test_notify_without_token_sends_nothing(telegram):
+    notifier = Notifier(None, '1', telegram.url)
+    notifier.notify('dropped')
+    notifier.close(1)
+    assert telegram.messages == []
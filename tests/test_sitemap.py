@@ -0,0 +1,33 @@
+import io
+
+from sitemap import SitemapEntry, parse_sitemap
+
+URLSET = ('<?xml version="1.0" encoding="UTF-8"?>'
+          '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+          'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">{}</urlset>')
+
+
+def parse(xml):
+    return parse_sitemap(io.BytesIO(xml.encode('utf-8')))
+
+
+def test_image_loc_does_not_replace_page_loc():
+    xml = URLSET.format(
+        '<url><loc>https://a.kz/p/</loc><lastmod>2024-05-01</lastmod><priority>0.8</priority>'
+        '<image:image><image:loc>https://a.kz/img/1.jpg</image:loc></image:image></url>'
+        '<url><image:image><image:loc>https://a.kz/img/2.jpg</image:loc></image:image>'
+        '<loc>https://a.kz/q/</loc></url>'
+    )
+    assert parse(xml) == ([], [SitemapEntry('https://a.kz/p/', '2024-05-01', '0.8'),
+                               SitemapEntry('https://a.kz/q/', None, None)])
+
+
+def test_url_without_page_loc_is_skipped():
+    xml = URLSET.format('<url><image:image><image:loc>https://a.kz/img/1.jpg</image:loc></image:image></url>')
+    assert parse(xml) == ([], [])
+
+
+def test_sitemap_index_without_namespace():
+    xml = ('<sitemapindex><sitemap><loc>https://a.kz/s1.xml</loc></sitemap>'
+           '<sitemap><loc>https://a.kz/s2.xml</loc><lastmod>2024-05-01</lastmod></sitemap></sitemapindex>')
+    assert parse(xml) == (['https://a.kz/s1.xml', 'https://a.kz/s2.xml'], [])
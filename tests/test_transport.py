@@ -0,0 +1,29 @@
+import httplib2
+
+from fake_services import TOKEN_PATH, make_service_account
+from google_client import get_service
+from publisher import index_batch
+
+
+def test_batch_refreshes_token_through_pooled_session(fake_api, monkeypatch):
+    raw_requests = []
+    request = httplib2.Http.request
+
+    def spy(self, uri, *args, **kwargs):
+        raw_requests.append(uri)
+        return request(self, uri, *args, **kwargs)
+
+    monkeypatch.setattr(httplib2.Http, 'request', spy)
+    credentials_json = make_service_account(fake_api.url + TOKEN_PATH, 'batch@fake-project.iam.gserviceaccount.com')
+    service = get_service(credentials_json, 'batch.local')
+    urls = [f'https://batch.local/p/{i}/' for i in range(3)]
+
+    assert all(response for _, response in index_batch(service, urls))
+    # Истёкший токен обновляется перед следующим batch-запросом
+    credentials = service._http.credentials
+    credentials.expiry = credentials.expiry.replace(year=2000)
+    assert all(response for _, response in index_batch(service, urls))
+
+    assert raw_requests == []
+    assert fake_api.stats['token'] == 2
+    assert fake_api.stats['batch'] == 2